@@ -1,12 +1,25 @@
 #!/usr/bin/env bash
 
+# Usage: ./run-analysis.sh [--interactive]
+#
+# With --interactive the figures are not rendered, instead the combined data is
+# exported as a JSON payload and the report draws the figures in the browser
+REPORT_MODE="static"
+if [[ "$1" == "--interactive" ]]; then
+    REPORT_MODE="interactive"
+fi
+
 # ==== 00. GET DATASETS ==== #
+echo "Downloading OECD datasets..."
+./scripts/00-download-datasets.py --out-dir data/00-raw data/sources.tsv
 echo "Downloading country codes..."
 ./scripts/00-download-country-codes.py --out-file data/00-raw/country-codes.tsv
 
 # ==== 01. TIDY DATASETS ==== #
 echo "Tidying country codes..."
 ./scripts/01-tidy-country-codes.py --out-file data/01-tidied/country-codes.tsv data/00-raw/country-codes.tsv
+echo "Building country reference..."
+./scripts/01-build-country-reference.py --out-file data/01-tidied/country-reference.npz data/01-tidied/country-codes.tsv
 echo "Tidying house prices..."
 ./scripts/01-tidy-house-prices.py --out-file data/01-tidied/house-prices.tsv data/00-raw/house-prices.csv
 echo "Tidying property tax..."
@@ -15,87 +28,100 @@ echo "Tidying property tax..."
 # ==== 02. COMBINE DATASETS ==== #
 echo "Combining datasets..."
 ./scripts/02-combine-datasets.py \
-    --country-codes data/01-tidied/country-codes.tsv \
+    --reference data/01-tidied/country-reference.npz \
     --house-prices data/01-tidied/house-prices.tsv \
     --property-tax data/01-tidied/property-tax.tsv \
     --out-file data/02-combined.tsv
 
+# ==== 03. ANALYSE VARIABLES ==== #
+echo "Calculating lagged correlations and panel regressions..."
+./scripts/03-analyse-panel.py --out-file output/03-panel-analysis.tsv data/02-combined.tsv
+
 # ==== 03. PLOT VARIABLES ==== #
-echo "Plotting Real Price Index..."
-./scripts/03-plot-barplot.py \
-    --out-file output/03-RPI-barplot.png \
-    --var RealPriceIndex \
-    --label "Real Price Index" \
-    data/02-combined.tsv
-echo "Plotting Price to Income Ratio..."
-./scripts/03-plot-barplot.py \
-    --out-file output/03-PriceRatio-barplot.png \
-    --var PriceIncomeRatio \
-    --label "Price to Income Ratio" \
-    data/02-combined.tsv
-echo "Plotting Percent GDP..."
-./scripts/03-plot-barplot.py \
-    --out-file output/03-PctGDP-barplot.png \
-    --var PctGDP \
-    --label "Housing Tax Percentage of GDP" \
-    data/02-combined.tsv
-echo "Plotting Percent Total Tax..."
-./scripts/03-plot-barplot.py \
-    --out-file output/03-PctTotalTax-barplot.png \
-    --var PctTotalTax \
-    --label "Housing Tax Percentage of Total Tax" \
-    data/02-combined.tsv
-echo "Plotting Real Price Index vs Price to Income Ratio..."
-./scripts/03-plot-scatterplot.py \
-    --out-file output/03-RPI-PriceRatio-scatterplot.png \
-    --x-var RealPriceIndex \
-    --x-label "Real Price Index" \
-    --y-var PriceIncomeRatio \
-    --y-label "Price to Income Ratio" \
-    data/02-combined.tsv
-echo "Plotting Percent Total Tax vs Percent GDP..."
-./scripts/03-plot-scatterplot.py \
-    --out-file output/03-PctTotalTax-PctGDP-scatterplot.png \
-    --x-var PctTotalTax \
-    --x-label "Housing Tax Percentage of Total Tax" \
-    --y-var PctGDP \
-    --y-label "Housing Tax Percentage of GDP" \
-    data/02-combined.tsv
-echo "Percent GDP vs Real Price Index..."
-./scripts/03-plot-scatterplot.py \
-    --out-file output/03-PctGDP-RPI-scatterplot.png \
-    --x-var PctGDP \
-    --x-label "Housing Tax Percentage of GDP" \
-    --y-var RealPriceIndex \
-    --y-label "Real Price Index" \
-    data/02-combined.tsv
-echo "Percent Total Tax vs Real Price Index..."
-./scripts/03-plot-scatterplot.py \
-    --out-file output/03-PctTotalTax-RPI-scatterplot.png \
-    --x-var PctTotalTax \
-    --x-label "Housing Tax Percentage of Total Tax" \
-    --y-var RealPriceIndex \
-    --y-label "Real Price Index" \
-    data/02-combined.tsv
-echo "Percent GDP vs Price Income Ratio..."
-./scripts/03-plot-scatterplot.py \
-    --out-file output/03-PctGDP-PriceRatio-scatterplot.png \
-    --x-var PctGDP \
-    --x-label "Housing Tax Percentage of GDP" \
-    --y-var PriceIncomeRatio \
-    --y-label "Price to Income Ratio" \
-    data/02-combined.tsv
-echo "Pct Total Tax vs Price Income Ratio..."
-./scripts/03-plot-scatterplot.py \
-    --out-file output/03-PctTotalTax-PriceRatio-scatterplot.png \
-    --x-var PctTotalTax \
-    --x-label "Housing Tax Percentage of Total Tax" \
-    --y-var PriceIncomeRatio \
-    --y-label "Price to Income Ratio" \
-    data/02-combined.tsv
+if [[ "$REPORT_MODE" == "interactive" ]]; then
+    echo "Exporting report data..."
+    ./scripts/03-export-payload.py --out-file output/03-combined.json data/02-combined.tsv
+else
+    echo "Plotting Real Price Index..."
+    ./scripts/03-plot-barplot.py \
+        --out-file output/03-RPI-barplot.png \
+        --var RealPriceIndex \
+        --label "Real Price Index" \
+        data/02-combined.tsv
+    echo "Plotting Price to Income Ratio..."
+    ./scripts/03-plot-barplot.py \
+        --out-file output/03-PriceRatio-barplot.png \
+        --var PriceIncomeRatio \
+        --label "Price to Income Ratio" \
+        data/02-combined.tsv
+    echo "Plotting Percent GDP..."
+    ./scripts/03-plot-barplot.py \
+        --out-file output/03-PctGDP-barplot.png \
+        --var PctGDP \
+        --label "Housing Tax Percentage of GDP" \
+        data/02-combined.tsv
+    echo "Plotting Percent Total Tax..."
+    ./scripts/03-plot-barplot.py \
+        --out-file output/03-PctTotalTax-barplot.png \
+        --var PctTotalTax \
+        --label "Housing Tax Percentage of Total Tax" \
+        data/02-combined.tsv
+    echo "Plotting Real Price Index vs Price to Income Ratio..."
+    ./scripts/03-plot-scatterplot.py \
+        --out-file output/03-RPI-PriceRatio-scatterplot.png \
+        --x-var RealPriceIndex \
+        --x-label "Real Price Index" \
+        --y-var PriceIncomeRatio \
+        --y-label "Price to Income Ratio" \
+        data/02-combined.tsv
+    echo "Plotting Percent Total Tax vs Percent GDP..."
+    ./scripts/03-plot-scatterplot.py \
+        --out-file output/03-PctTotalTax-PctGDP-scatterplot.png \
+        --x-var PctTotalTax \
+        --x-label "Housing Tax Percentage of Total Tax" \
+        --y-var PctGDP \
+        --y-label "Housing Tax Percentage of GDP" \
+        data/02-combined.tsv
+    echo "Percent GDP vs Real Price Index..."
+    ./scripts/03-plot-scatterplot.py \
+        --out-file output/03-PctGDP-RPI-scatterplot.png \
+        --x-var PctGDP \
+        --x-label "Housing Tax Percentage of GDP" \
+        --y-var RealPriceIndex \
+        --y-label "Real Price Index" \
+        data/02-combined.tsv
+    echo "Percent Total Tax vs Real Price Index..."
+    ./scripts/03-plot-scatterplot.py \
+        --out-file output/03-PctTotalTax-RPI-scatterplot.png \
+        --x-var PctTotalTax \
+        --x-label "Housing Tax Percentage of Total Tax" \
+        --y-var RealPriceIndex \
+        --y-label "Real Price Index" \
+        data/02-combined.tsv
+    echo "Percent GDP vs Price Income Ratio..."
+    ./scripts/03-plot-scatterplot.py \
+        --out-file output/03-PctGDP-PriceRatio-scatterplot.png \
+        --x-var PctGDP \
+        --x-label "Housing Tax Percentage of GDP" \
+        --y-var PriceIncomeRatio \
+        --y-label "Price to Income Ratio" \
+        data/02-combined.tsv
+    echo "Pct Total Tax vs Price Income Ratio..."
+    ./scripts/03-plot-scatterplot.py \
+        --out-file output/03-PctTotalTax-PriceRatio-scatterplot.png \
+        --x-var PctTotalTax \
+        --x-label "Housing Tax Percentage of Total Tax" \
+        --y-var PriceIncomeRatio \
+        --y-label "Price to Income Ratio" \
+        data/02-combined.tsv
+fi
 
 # ==== 90. RENDER REPORT ==== #
 echo "Rendering HTML report..."
-quarto render
+if [[ "$REPORT_MODE" == "interactive" ]]; then
+    quarto render --profile interactive
+else
+    quarto render
+fi
 
 echo "Done!"
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+"""
+Download the raw datasets listed in a sources file
+
+All sources are downloaded at the same time. Responses are streamed to disk,
+interrupted downloads are resumed if the server shows the file has not changed
+and files are checked against their SHA256 checksum if one is given.
+
+Usage:
+    00-download-datasets.py --out-dir=<path> [options] <sources>
+
+Options:
+    -h --help               Show this screen.
+    --out-dir=<path>        Directory to write downloaded files to.
+    --max-concurrent=<int>  Maximum number of simultaneous downloads [default: 4].
+    --retries=<int>         Number of times to retry a failed download [default: 3].
+    --timeout=<secs>        Timeout for each download in seconds [default: 600].
+"""
+
+import os
+
+# Size of the chunks written to disk while streaming a response
+CHUNK_SIZE = 64 * 1024
+
+
+def read_sources(file):
+    """
+    Read the list of sources to download
+
+    :param file: Path to a TSV file with Name, URL, File and SHA256 columns,
+        SHA256 can be empty to skip checking the download
+
+    :return: List of dictionaries, one for each source
+    """
+
+    from csv import DictReader
+
+    with open(file, newline="") as handle:
+        sources = list(DictReader(handle, delimiter="\t"))
+
+    return sources
+
+
+def file_checksum(path):
+    """
+    Calculate the SHA256 checksum of a file
+
+    :param path: Path to the file
+
+    :return: Hex digest string
+    """
+
+    from hashlib import file_digest
+
+    with open(path, "rb") as file:
+        checksum = file_digest(file, "sha256").hexdigest()
+
+    return checksum
+
+
+def response_validator(response):
+    """
+    Get the validator that identifies the version of a response
+
+    A strong ETag is preferred, weak ETags cannot be used with If-Range so the
+    Last-Modified date is used instead.
+
+    :param response: aiohttp ClientResponse object
+
+    :return: Validator string, None if the response does not have one
+    """
+
+    etag = response.headers.get("ETag")
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+
+    return response.headers.get("Last-Modified")
+
+
+def remove_partial(part_file):
+    """
+    Remove a partial download file and its validator
+
+    :param part_file: Path to the partial download file
+
+    :return: None
+    """
+
+    for path in [part_file, f"{part_file}.validator"]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+async def fetch(session, url, part_file, checksum=None):
+    """
+    Stream a URL to a partial download file, resuming it if it already exists
+
+    The ETag or Last-Modified value of the response is saved next to the
+    partial file and sent as If-Range when resuming, so the server sends the
+    whole file again if it has changed. A partial file without a validator is
+    only resumed if there is a checksum to check the finished file against,
+    otherwise it is removed and the download starts again.
+
+    :param session: aiohttp ClientSession object
+    :param url: URL to download
+    :param part_file: Path to the partial download file
+    :param checksum: Expected SHA256 checksum of the finished file, if known
+
+    :return: None
+    """
+
+    validator_file = f"{part_file}.validator"
+    offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    validator = None
+    if offset and os.path.exists(validator_file):
+        with open(validator_file) as file:
+            validator = file.read().strip() or None
+    if offset and validator is None and not checksum:
+        print(f"Cannot check '{part_file}' is still current, starting again...")
+        remove_partial(part_file)
+        offset = 0
+
+    # Ask for the raw bytes so range offsets match the file on disk
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if validator is not None:
+            headers["If-Range"] = validator
+
+    async with session.get(url, headers=headers) as response:
+        if offset and response.status == 416:
+            # The range is only unsatisfiable if the partial file is the whole
+            # of the current version, otherwise start again
+            content_range = response.headers.get("Content-Range", "")
+            if content_range == f"bytes */{offset}":
+                return
+            print(f"'{part_file}' does not match the server, starting again...")
+            remove_partial(part_file)
+            return await fetch(session, url, part_file, checksum)
+        response.raise_for_status()
+
+        if response.status == 206:
+            # Some servers ignore If-Range so check the version has not changed
+            if validator is not None and response_validator(response) != validator:
+                print(f"'{part_file}' does not match the server, starting again...")
+                remove_partial(part_file)
+                return await fetch(session, url, part_file, checksum)
+            mode = "ab"
+        else:
+            # The server sent the whole file, either because the range was
+            # ignored or because the file has changed
+            mode = "wb"
+            validator = response_validator(response)
+            if validator is None:
+                remove_partial(part_file)
+            else:
+                with open(validator_file, "w") as file:
+                    file.write(validator)
+
+        with open(part_file, mode) as file:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                file.write(chunk)
+
+
+async def download_source(session, semaphore, source, out_dir, retries):
+    """
+    Download a single source, retrying failed attempts
+
+    :param session: aiohttp ClientSession object
+    :param semaphore: asyncio Semaphore limiting simultaneous downloads
+    :param source: Dictionary with Name, URL, File and SHA256 entries
+    :param out_dir: Directory to write the downloaded file to
+    :param retries: Number of times to retry a failed download
+
+    :return: Path to the downloaded file
+    """
+
+    import asyncio
+
+    import aiohttp
+
+    name = source["Name"]
+    checksum = source["SHA256"]
+    out_file = os.path.join(out_dir, source["File"])
+    part_file = f"{out_file}.part"
+
+    if checksum and os.path.exists(out_file) and file_checksum(out_file) == checksum:
+        print(f"'{name}' is already up to date")
+        return out_file
+
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                print(f"Downloading '{name}' from '{source['URL']}'...")
+                await fetch(session, source["URL"], part_file, checksum)
+            break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            if attempt == retries:
+                raise
+            delay = 2**attempt
+            print(f"Downloading '{name}' failed ({error}), retrying in {delay}s...")
+            await asyncio.sleep(delay)
+
+    if checksum:
+        downloaded_checksum = file_checksum(part_file)
+        if downloaded_checksum != checksum:
+            remove_partial(part_file)
+            raise ValueError(
+                f"Checksum for '{name}' does not match, "
+                f"expected {checksum} but got {downloaded_checksum}"
+            )
+
+    os.replace(part_file, out_file)
+    remove_partial(part_file)
+    print(f"Downloaded '{name}' to '{out_file}'")
+
+    return out_file
+
+
+async def download_datasets(sources, out_dir, max_concurrent=4, retries=3, timeout=600):
+    """
+    Download all sources at the same time
+
+    :param sources: List of source dictionaries from read_sources()
+    :param out_dir: Directory to write downloaded files to
+    :param max_concurrent: Maximum number of simultaneous downloads
+    :param retries: Number of times to retry a failed download
+    :param timeout: Timeout for each download in seconds
+
+    :return: List of paths to the downloaded files
+    """
+
+    import asyncio
+
+    import aiohttp
+
+    os.makedirs(out_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(max_concurrent)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        paths = await asyncio.gather(
+            *[
+                download_source(session, semaphore, source, out_dir, retries)
+                for source in sources
+            ]
+        )
+
+    return paths
+
+
+def main():
+    """The main script function"""
+    import asyncio
+
+    from docopt import docopt
+
+    args = docopt(__doc__)
+
+    sources_file = args["<sources>"]
+    out_dir = args["--out-dir"]
+    max_concurrent = int(args["--max-concurrent"])
+    retries = int(args["--retries"])
+    timeout = float(args["--timeout"])
+
+    print(f"Reading sources from '{sources_file}'...")
+    sources = read_sources(sources_file)
+    print(f"Downloading {len(sources)} sources to '{out_dir}'...")
+    paths = asyncio.run(
+        download_datasets(sources, out_dir, max_concurrent, retries, timeout)
+    )
+    for path in paths:
+        print(path)
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
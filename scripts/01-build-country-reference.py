@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+"""
+Build the country reference table used to label the combined dataset
+
+Usage:
+    01-build-country-reference.py --out-file=<path> [options] <file>
+
+Options:
+    -h --help            Show this screen.
+    --out-file=<path>    Path to output file.
+"""
+
+# Codes used by the OECD datasets that are not countries
+EXTRA_CODES = {"OECD": "OECD Average"}
+
+# Shorter labels for countries with long names
+COUNTRY_LABELS = {
+    "United Kingdom of Great Britain and Northern Ireland (the)": "United Kingdom",
+    "Korea (the Republic of)": "Republic of Korea",
+    "United States of America (the)": "United States",
+    "Netherlands (the)": "Netherlands",
+}
+
+
+def build_country_reference(country_codes):
+    """
+    Build the country reference table from tidied country codes
+
+    :param country_codes: DataFrame containing tidied country codes
+
+    :return: DataFrame with Code3, Country and CountryLabel columns
+    """
+
+    from pandas import DataFrame, concat
+
+    print("Adding extra codes...")
+    reference = concat(
+        [
+            country_codes[["Code3", "Country"]],
+            DataFrame({"Code3": EXTRA_CODES.keys(), "Country": EXTRA_CODES.values()}),
+        ],
+        ignore_index=True,
+    )
+
+    print("Adding country labels...")
+    labels = reference["Country"].replace(COUNTRY_LABELS)
+    reference["CountryLabel"] = labels + " (" + reference["Code3"] + ")"
+
+    return reference
+
+
+def main():
+    """The main script function"""
+    from docopt import docopt
+
+    from reference import write_reference
+    from schemas import COUNTRY_CODES, read_table
+
+    args = docopt(__doc__)
+
+    file = args["<file>"]
+    out_file = args["--out-file"]
+
+    print(f"Reading country codes from '{file}'...")
+    input = read_table(file, COUNTRY_CODES, usecols=["Code3", "Country"])
+    print(input)
+    output = build_country_reference(input)
+    print(output)
+    print(f"Writing output to '{out_file}'...")
+    write_reference(output, out_file)
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,19 @@ Options:
     --out-file=<path>    Path to output file.
 """
 
+# Raw columns to keep and their new names
+COLUMNS = {
+    "Country name[5]": "Country",
+    "Official state name[6]": "OfficialName",
+    "Alpha-2 code[5]": "Code2",
+    "Alpha-3 code[5]": "Code3",
+    "Numeric code[5]": "CodeNumeric",
+    "Internet ccTLD[9]": "TLD",
+}
+
+# Columns with Wikipedia footnote markers (such as "[b]") to remove
+FOOTNOTE_COLUMNS = ["Country", "OfficialName", "TLD"]
+
 
 def tidy_country_codes(codes):
     """
@@ -22,20 +35,13 @@ def tidy_country_codes(codes):
     """
 
     print("Tidying country codes...")
-    codes = codes.iloc[:, [0, 1, 3, 4, 5, 7]]
-    codes = codes.rename(
-        columns={
-            "Country name[5]": "Country",
-            "Official state name[6]": "OfficialName",
-            "Alpha-2 code[5]": "Code2",
-            "Alpha-3 code[5]": "Code3",
-            "Numeric code[5]": "CodeNumeric",
-            "Internet ccTLD[9]": "TLD",
-        }
-    )
+    codes = codes[COLUMNS.keys()]
+    codes = codes.rename(columns=COLUMNS)
     codes = codes.sort_values(by="Country")
     # Remove footnotes
-    codes = codes.apply(lambda x: x.str.replace("\s?\\[[a-z]+\\]\s?", "", regex=True))
+    codes[FOOTNOTE_COLUMNS] = codes[FOOTNOTE_COLUMNS].replace(
+        r"\s?\[[a-z]+\]\s?", "", regex=True
+    )
     # Replace rogue HTML in the first Code2 value
     codes["Code2"][0] = "AF"
     # Remove annotation rows
@@ -47,7 +53,8 @@ def tidy_country_codes(codes):
 def main():
     """The main script function"""
     from docopt import docopt
-    from pandas import read_csv
+
+    from schemas import RAW_COUNTRY_CODES, read_table
 
     args = docopt(__doc__)
 
@@ -55,7 +62,7 @@ def main():
     out_file = args["--out-file"]
 
     print(f"Reading input from '{file}'...")
-    input = read_csv(file, sep="\t")
+    input = read_table(file, RAW_COUNTRY_CODES, usecols=list(COLUMNS))
     print(input)
     output = tidy_country_codes(input)
     print(output)
@@ -11,6 +11,9 @@ Options:
     --out-file=<path>    Path to output file.
 """
 
+# Raw columns used for tidying
+COLUMNS = ["COU", "IND", "TIME", "Value"]
+
 
 def tidy_house_prices(house_prices):
     """
@@ -23,22 +26,7 @@ def tidy_house_prices(house_prices):
 
     print("Tidying house prices...")
     # Select columns
-    house_prices = house_prices.drop(
-        [
-            "Country",
-            "Indicator",
-            "Time",
-            "Unit Code",
-            "Unit",
-            "PowerCode Code",
-            "PowerCode",
-            "Reference Period Code",
-            "Reference Period",
-            "Flag Codes",
-            "Flags",
-        ],
-        axis=1,
-    )
+    house_prices = house_prices[COLUMNS]
     # Pivot wider to make values into separate columns
     house_prices = house_prices.pivot(
         index=["COU", "TIME"], columns="IND", values="Value"
@@ -55,6 +43,7 @@ def tidy_house_prices(house_prices):
     )
     # Filter to only annual data
     house_prices = house_prices[~house_prices["Year"].str.contains("Q")]
+    house_prices["Year"] = house_prices["Year"].astype("int16")
 
     return house_prices
 
@@ -62,7 +51,8 @@ def tidy_house_prices(house_prices):
 def main():
     """The main script function"""
     from docopt import docopt
-    from pandas import read_csv
+
+    from schemas import RAW_HOUSE_PRICES, read_table
 
     args = docopt(__doc__)
 
@@ -70,7 +60,7 @@ def main():
     out_file = args["--out-file"]
 
     print(f"Reading input from '{file}'...")
-    input = read_csv(file)
+    input = read_table(file, RAW_HOUSE_PRICES, usecols=COLUMNS)
     print(input)
     output = tidy_house_prices(input)
     print(output)
@@ -11,6 +11,9 @@ Options:
     --out-file=<path>    Path to output file.
 """
 
+# Raw columns used for tidying
+COLUMNS = ["LOCATION", "MEASURE", "TIME", "Value"]
+
 
 def tidy_property_tax(property_tax):
     """
@@ -23,15 +26,7 @@ def tidy_property_tax(property_tax):
 
     print("Tidying property tax...")
     # Select columns
-    property_tax = property_tax.drop(
-        [
-            "INDICATOR",
-            "SUBJECT",
-            "FREQUENCY",
-            "Flag Codes",
-        ],
-        axis=1,
-    )
+    property_tax = property_tax[COLUMNS]
     # Pivot wider to make values into separate columns
     property_tax = property_tax.pivot(
         index=["LOCATION", "TIME"], columns="MEASURE", values="Value"
@@ -47,7 +42,7 @@ def tidy_property_tax(property_tax):
         }
     )
     # Filter to years from 2000 onwards
-    property_tax = property_tax[property_tax["Year"].astype(int) >= 2000]
+    property_tax = property_tax[property_tax["Year"] >= 2000]
 
     return property_tax
 
@@ -55,7 +50,8 @@ def tidy_property_tax(property_tax):
 def main():
     """The main script function"""
     from docopt import docopt
-    from pandas import read_csv
+
+    from schemas import RAW_PROPERTY_TAX, read_table
 
     args = docopt(__doc__)
 
@@ -63,7 +59,7 @@ def main():
     out_file = args["--out-file"]
 
     print(f"Reading input from '{file}'...")
-    input = read_csv(file)
+    input = read_table(file, RAW_PROPERTY_TAX, usecols=COLUMNS)
     print(input)
     output = tidy_property_tax(input)
     print(output)
@@ -4,29 +4,29 @@
 Combine datasets
 
 Usage:
-    02-combine-datasets.py --country-codes=<path> --house-prices=<path> --property-tax=<path> --out-file=<path> [options]
+    02-combine-datasets.py --reference=<path> --house-prices=<path> --property-tax=<path> --out-file=<path> [options]
 
 Options:
     -h --help                 Show this screen.
-    --country-codes=<path>    Path to TSV file containing country codes.
+    --reference=<path>        Path to country reference table.
     --house-prices=<path>     Path to TSV file containing house prices data.
     --property-tax=<path>     Path to TSV file containing property tax data.
     --out-file=<path>         Path to output file.
 """
 
 
-def combine_datasets(country_codes, house_prices, property_tax):
+def combine_datasets(reference, house_prices, property_tax):
     """
-    Combine country codes, house prices and property tax data into a single DataFrame
+    Combine house prices and property tax data into a single DataFrame
 
-    :param country_codes: DataFrame containing country codes
+    :param reference: Country reference DataFrame from load_reference()
     :param house_prices: DataFrame containing house prices data
     :param property_tax: DataFrame containing property tax data
 
     :return: DataFrame containing combined data
     """
 
-    from pandas import concat, Series
+    from reference import lookup_field
 
     print("Merging house prices and property tax...")
     # Rename the OAVG country code to OECD for consistency
@@ -41,30 +41,14 @@ def combine_datasets(country_codes, house_prices, property_tax):
     # Use inner join to only keep rows present in both datasets
     combined = house_prices.merge(property_tax, on=["Code3", "Year"], how="inner")
 
-    print("Adding country names...")
-    # Select three letter code and country names
-    country_codes = country_codes[["Code3", "Country"]]
-    # Add row for OECD average
-    oecd_code = Series({"Code3": "OECD", "Country": "OECD Average"})
-    country_codes = concat([country_codes, oecd_code.to_frame().T], ignore_index=True)
-    # Add country names to combined dataset
-    combined = combined.merge(country_codes, on="Code3", how="left")
-    # Move country name column
-    combined.insert(1, "Country", combined.pop("Country"))
-
-    print("Adding country labels...")
-    combined["CountryLabel"] = combined["Country"]
-    # Replace country names with labels
-    combined["CountryLabel"] = combined["CountryLabel"].replace(
-        {
-            "United Kingdom of Great Britain and Northern Ireland (the)": "United Kingdom",
-            "Korea (the Republic of)": "Republic of Korea",
-            "United States of America (the)": "United States",
-            "Netherlands (the)": "Netherlands",
-        }
+    print("Adding country names and labels...")
+    # Names and labels are looked up once for each country
+    combined.insert(1, "Country", lookup_field(combined["Code3"], reference, "Country"))
+    combined.insert(
+        2,
+        "CountryLabel",
+        lookup_field(combined["Code3"], reference, "CountryLabel"),
     )
-    combined["CountryLabel"] = combined["CountryLabel"] + " (" + combined["Code3"] + ")"
-    combined.insert(2, "CountryLabel", combined.pop("CountryLabel"))
 
     # Remove countries with incomplete years
     print("Removing countries with incomplete years...")
@@ -74,7 +58,7 @@ def combine_datasets(country_codes, house_prices, property_tax):
     combined = combined.dropna()
     # Get list of countries with complete years
     complete_countries = (
-        combined.groupby("Code3")
+        combined.groupby("Code3", observed=True)
         .filter(lambda x: min(x["Year"]) == 2000 and max(x["Year"]) == 2020)["Code3"]
         .unique()
     )
@@ -86,26 +70,28 @@ def combine_datasets(country_codes, house_prices, property_tax):
 def main():
     """The main script function"""
     from docopt import docopt
-    from pandas import read_csv
+
+    from reference import load_reference
+    from schemas import HOUSE_PRICES, PROPERTY_TAX, read_table
 
     args = docopt(__doc__)
 
-    country_codes_file = args["--country-codes"]
+    reference_file = args["--reference"]
     house_prices_file = args["--house-prices"]
     property_tax_file = args["--property-tax"]
     out_file = args["--out-file"]
 
-    print(f"Reading country codes from '{country_codes_file}'...")
-    country_codes = read_csv(country_codes_file, sep="\t")
-    print(country_codes)
+    print(f"Reading country reference from '{reference_file}'...")
+    reference = load_reference(reference_file)
+    print(reference)
     print(f"Reading house prices from '{house_prices_file}'...")
-    house_prices = read_csv(house_prices_file, sep="\t")
+    house_prices = read_table(house_prices_file, HOUSE_PRICES)
     print(house_prices)
     print(f"Reading property tax from '{property_tax_file}'...")
-    property_tax = read_csv(property_tax_file, sep="\t")
+    property_tax = read_table(property_tax_file, PROPERTY_TAX)
     print(property_tax)
     print("Combining datasets...")
-    output = combine_datasets(country_codes, house_prices, property_tax)
+    output = combine_datasets(reference, house_prices, property_tax)
     print(output)
     print(f"Writing output to '{out_file}'...")
     output.to_csv(out_file, sep="\t", index=False)
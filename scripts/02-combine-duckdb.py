@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+"""
+Tidy and combine datasets with DuckDB, straight from the raw files
+
+This is an alternative to running the 01-tidy-house-prices.py,
+01-tidy-property-tax.py and 02-combine-datasets.py scripts. The tidying and
+combining steps are written as a single query so DuckDB can push column
+selection and filters down to the CSV scans before the pivot and join, and can
+spill to disk instead of holding every intermediate table in memory. The raw
+files and the result are checked with the same rules as schemas.validate(), so
+duplicated keys, missing values and values out of range raise an error as they
+do in the pandas scripts, and the output is the same.
+
+Usage:
+    02-combine-duckdb.py --reference=<path> --house-prices=<path> --property-tax=<path> --out-file=<path> [options]
+
+Options:
+    -h --help                 Show this screen.
+    --reference=<path>        Path to country reference table.
+    --house-prices=<path>     Path to CSV file containing raw house prices data.
+    --property-tax=<path>     Path to CSV file containing raw property tax data.
+    --out-file=<path>         Path to output file.
+    --memory-limit=<size>     Memory DuckDB can use before spilling to disk, eg. 1GB.
+    --compare=<path>          Path to the output of the pandas scripts to check against.
+"""
+
+# DuckDB types for the dtypes used in the schemas
+DUCKDB_TYPES = {
+    "category": "VARCHAR",
+    "str": "VARCHAR",
+    "int16": "SMALLINT",
+    "float32": "FLOAT",
+    "float64": "DOUBLE",
+}
+
+QUERY = """
+WITH house_prices AS (
+    SELECT
+        COU AS Code3,
+        CAST(TIME AS SMALLINT) AS Year,
+        max(Value) FILTER (WHERE IND = 'HPI_YDH_AVG') AS PriceIncomeRatio,
+        max(Value) FILTER (WHERE IND = 'RHP') AS RealPriceIndex
+    FROM {house_prices}
+    -- Remove quarterly values
+    WHERE TIME NOT LIKE '%Q%'
+    GROUP BY COU, TIME
+),
+property_tax AS (
+    SELECT
+        -- Rename the OAVG country code to OECD for consistency
+        CASE WHEN LOCATION = 'OAVG' THEN 'OECD' ELSE LOCATION END AS Code3,
+        TIME AS Year,
+        max(Value) FILTER (WHERE MEASURE = 'PC_GDP') AS PctGDP,
+        max(Value) FILTER (WHERE MEASURE = 'PC_TOT_TAX') AS PctTotalTax
+    FROM {property_tax}
+    WHERE TIME >= 2000
+    GROUP BY LOCATION, TIME
+),
+combined AS (
+    SELECT
+        Code3,
+        Country,
+        CountryLabel,
+        Year,
+        PriceIncomeRatio,
+        RealPriceIndex,
+        PctGDP,
+        PctTotalTax
+    FROM house_prices
+    INNER JOIN property_tax USING (Code3, Year)
+    LEFT JOIN reference USING (Code3)
+    -- Filter years after 2020 and remove entries with missing values
+    WHERE Year <= 2020
+        AND Country IS NOT NULL
+        AND PriceIncomeRatio IS NOT NULL
+        AND RealPriceIndex IS NOT NULL
+        AND PctGDP IS NOT NULL
+        AND PctTotalTax IS NOT NULL
+)
+SELECT *
+FROM combined
+-- Remove countries with incomplete years
+QUALIFY min(Year) OVER (PARTITION BY Code3) = 2000
+    AND max(Year) OVER (PARTITION BY Code3) = 2020
+ORDER BY Code3, Year
+"""
+
+
+def quote(value):
+    """
+    Quote a string as an SQL literal
+
+    :param value: String to quote
+
+    :return: Quoted string
+    """
+
+    return "'" + value.replace("'", "''") + "'"
+
+
+def quote_identifier(name):
+    """
+    Quote a string as an SQL identifier
+
+    :param name: Column or table name
+
+    :return: Quoted string
+    """
+
+    return '"' + name.replace('"', '""') + '"'
+
+
+def scan_csv(file, schema):
+    """
+    Get the SQL for scanning a file described by a schema
+
+    Column names and types are given explicitly so DuckDB does not have to
+    sniff the file and any byte order mark on the header is ignored. Column
+    names in DuckDB are not case sensitive so later columns that clash with an
+    earlier name (such as "Time" after "TIME") get their position added.
+
+    :param file: Path to the file
+    :param schema: Schema dictionary for the file
+
+    :return: SQL string
+    """
+
+    columns = []
+    seen = set()
+    for position, (column, dtype) in enumerate(schema["dtype"].items()):
+        if column.lower() in seen:
+            column = f"{column}_{position}"
+        seen.add(column.lower())
+        columns.append(f"{quote(column)}: {quote(DUCKDB_TYPES[dtype])}")
+    columns = ", ".join(columns)
+
+    return (
+        f"read_csv({quote(file)}, header = true, delim = {quote(schema['sep'])}, "
+        f"quote = '\"', columns = {{{columns}}})"
+    )
+
+
+def build_query(house_prices_file, property_tax_file):
+    """
+    Build the query that tidies and combines the datasets
+
+    The query expects the country reference table to be registered as
+    "reference".
+
+    :param house_prices_file: Path to CSV file containing raw house prices data
+    :param property_tax_file: Path to CSV file containing raw property tax data
+
+    :return: SQL string
+    """
+
+    from schemas import RAW_HOUSE_PRICES, RAW_PROPERTY_TAX
+
+    query = QUERY.format(
+        house_prices=scan_csv(house_prices_file, RAW_HOUSE_PRICES),
+        property_tax=scan_csv(property_tax_file, RAW_PROPERTY_TAX),
+    )
+
+    return query
+
+
+def validate_relation(connection, relation, schema):
+    """
+    Validate a table or file scan against a schema
+
+    The same checks as schemas.validate() are run as DuckDB queries so the
+    data is not loaded into pandas. Example rows are only fetched for checks
+    that fail.
+
+    :param connection: DuckDB connection object
+    :param relation: SQL for the relation to check, a table name or file scan
+    :param schema: Schema dictionary for the relation
+
+    :return: None, raises a ValueError if there are any problems
+    """
+
+    from schemas import MAX_EXAMPLES, format_problem
+
+    problems = []
+
+    keys = schema["keys"]
+    if keys:
+        key_list = ", ".join(quote_identifier(column) for column in keys)
+        duplicated = connection.execute(
+            f"SELECT {key_list}, count(*) AS Rows FROM {relation} "
+            f"GROUP BY {key_list} HAVING count(*) > 1 ORDER BY {key_list}"
+        ).df()
+        if not duplicated.empty:
+            problems.append(
+                format_problem(
+                    f"{duplicated['Rows'].sum()} rows with duplicated "
+                    f"{tuple(keys)} keys",
+                    duplicated[keys],
+                )
+            )
+
+    # Count every problem in a single scan, then fetch examples for the
+    # checks that failed
+    conditions = {}
+    for column in schema["required"]:
+        message = f"missing values in '{column}'"
+        conditions[message] = f"{quote_identifier(column)} IS NULL"
+    for column, (minimum, maximum) in schema["ranges"].items():
+        outside = []
+        if minimum is not None:
+            outside.append(f"{quote_identifier(column)} < {minimum}")
+        if maximum is not None:
+            outside.append(f"{quote_identifier(column)} > {maximum}")
+        message = f"values in '{column}' outside [{minimum}, {maximum}]"
+        conditions[message] = " OR ".join(outside)
+
+    if conditions:
+        counts = connection.execute(
+            "SELECT "
+            + ", ".join(
+                f"count(*) FILTER (WHERE {condition})"
+                for condition in conditions.values()
+            )
+            + f" FROM {relation}"
+        ).fetchone()
+        for (message, condition), count in zip(conditions.items(), counts):
+            if count == 0:
+                continue
+            examples = connection.execute(
+                f"SELECT * FROM {relation} WHERE {condition} LIMIT {MAX_EXAMPLES}"
+            ).df()
+            problems.append(format_problem(f"{count} {message}", examples))
+
+    if problems:
+        report = "\n".join(problems)
+        raise ValueError(f"Validation of {schema['name']} failed:\n{report}")
+
+
+def compare_outputs(out_file, compare_file):
+    """
+    Check that two combined datasets are the same
+
+    :param out_file: Path to the output of this script
+    :param compare_file: Path to the output of the pandas scripts
+
+    :return: None, raises an AssertionError if the datasets are different
+    """
+
+    from pandas.testing import assert_frame_equal
+
+    from schemas import COMBINED, read_table
+
+    output = read_table(out_file, COMBINED)
+    expected = read_table(compare_file, COMBINED)
+    assert_frame_equal(output, expected, check_exact=True)
+
+
+def combine_raw_datasets(
+    connection, reference, house_prices_file, property_tax_file, out_file
+):
+    """
+    Validate the raw files, tidy and combine them and write the result
+
+    :param connection: DuckDB connection object
+    :param reference: Country reference DataFrame from reference.load_reference()
+    :param house_prices_file: Path to CSV file containing raw house prices data
+    :param property_tax_file: Path to CSV file containing raw property tax data
+    :param out_file: Path to output file
+
+    :return: None
+    """
+
+    from schemas import COMBINED, RAW_HOUSE_PRICES, RAW_PROPERTY_TAX
+
+    connection.register("reference", reference.reset_index())
+
+    print(f"Validating house prices from '{house_prices_file}'...")
+    validate_relation(
+        connection, scan_csv(house_prices_file, RAW_HOUSE_PRICES), RAW_HOUSE_PRICES
+    )
+    print(f"Validating property tax from '{property_tax_file}'...")
+    validate_relation(
+        connection, scan_csv(property_tax_file, RAW_PROPERTY_TAX), RAW_PROPERTY_TAX
+    )
+
+    print("Building query...")
+    query = build_query(house_prices_file, property_tax_file)
+    print(connection.execute(f"EXPLAIN {query}").fetchall()[0][1])
+    print("Combining datasets...")
+    connection.execute(f"CREATE OR REPLACE TEMP TABLE output AS {query}")
+    validate_relation(connection, "output", COMBINED)
+    print(f"Writing output to '{out_file}'...")
+    connection.execute(
+        f"COPY (SELECT * FROM output ORDER BY Code3, Year) "
+        f"TO {quote(out_file)} (HEADER, DELIMITER '\t')"
+    )
+
+
+def main():
+    """The main script function"""
+    import duckdb
+    from docopt import docopt
+
+    from reference import load_reference
+
+    args = docopt(__doc__)
+
+    reference_file = args["--reference"]
+    house_prices_file = args["--house-prices"]
+    property_tax_file = args["--property-tax"]
+    out_file = args["--out-file"]
+    memory_limit = args["--memory-limit"]
+    compare_file = args["--compare"]
+
+    connection = duckdb.connect()
+    if memory_limit is not None:
+        connection.execute(f"SET memory_limit = {quote(memory_limit)}")
+
+    print(f"Reading country reference from '{reference_file}'...")
+    reference = load_reference(reference_file)
+    combine_raw_datasets(
+        connection, reference, house_prices_file, property_tax_file, out_file
+    )
+    if compare_file is not None:
+        print(f"Comparing output to '{compare_file}'...")
+        compare_outputs(out_file, compare_file)
+        print("Outputs are the same")
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+
+"""
+Tidy and combine datasets in shards partitioned by country
+
+The raw inputs are split into shards by a hash of the country code so every
+row for a country ends up in the same shard. Each shard is then tidied and
+combined independently, either by local worker processes or by separate nodes
+sharing the shard directory, and the results are merged into a single file.
+The split step writes a manifest with the number of shards and an id for the
+split. Each processed shard records the split id it was made from so merging
+only uses shards from the most recent split.
+
+Usage:
+    02-combine-sharded.py split --shard-dir=<path> --house-prices=<path> --property-tax=<path> [options]
+    02-combine-sharded.py process --shard-dir=<path> --reference=<path> [options] [<shard>...]
+    02-combine-sharded.py merge --shard-dir=<path> --out-file=<path>
+
+Options:
+    -h --help                 Show this screen.
+    --shard-dir=<path>        Directory containing the shards.
+    --house-prices=<path>     Path to CSV file containing raw house prices data.
+    --property-tax=<path>     Path to CSV file containing raw property tax data.
+    --reference=<path>        Path to country reference table.
+    --out-file=<path>         Path to output file.
+    --shards=<int>            Number of shards to split the data into [default: 8].
+    --chunk-size=<int>        Number of raw rows to read at a time [default: 100000].
+    --workers=<int>           Number of worker processes, 0 to use all cores [default: 0].
+"""
+
+import os
+
+# Codes that are renamed when the datasets are combined, these need to be in
+# the same shard as the code they are renamed to
+SHARD_ALIASES = {"OAVG": "OECD"}
+
+# Name of the file in the shard directory listing the shards
+MANIFEST_NAME = "manifest.json"
+
+# Files written to a shard by the process step, the combined output and the id
+# of the split it was made from
+PROCESSED_NAMES = ["combined.tsv", "combined.tsv.tmp", "combined.split"]
+
+
+def shard_path(shard_dir, shard, file_name=None):
+    """
+    Get the path to a shard directory or a file within it
+
+    :param shard_dir: Directory containing the shards
+    :param shard: Shard number
+    :param file_name: Name of a file in the shard directory
+
+    :return: Path string
+    """
+
+    path = os.path.join(shard_dir, f"shard-{shard:03d}")
+    if file_name is not None:
+        path = os.path.join(path, file_name)
+
+    return path
+
+
+def assign_shards(codes, n_shards):
+    """
+    Assign country codes to shards
+
+    Codes are hashed with CRC32 so the assignment is the same in every process
+    and on every node. The hash is calculated once per distinct code.
+
+    :param codes: Categorical Series of country codes
+    :param n_shards: Number of shards
+
+    :return: Array of shard numbers, one for each row
+    """
+
+    from zlib import crc32
+
+    import numpy as np
+
+    category_shards = np.array(
+        [
+            crc32(SHARD_ALIASES.get(code, code).encode()) % n_shards
+            for code in codes.cat.categories
+        ]
+    )
+
+    return category_shards[codes.cat.codes.to_numpy()]
+
+
+def split_raw(
+    file, schema, columns, code_column, out_name, shard_dir, n_shards, chunk_size
+):
+    """
+    Split a raw data file into shards
+
+    The file is read in chunks so memory use does not depend on the file size.
+
+    :param file: Path to the raw data file
+    :param schema: Schema dictionary for the file
+    :param columns: Columns to keep
+    :param code_column: Name of the country code column
+    :param out_name: Name of the file written to each shard
+    :param shard_dir: Directory containing the shards
+    :param n_shards: Number of shards
+    :param chunk_size: Number of rows to read at a time
+
+    :return: List with the number of rows written to each shard
+    """
+
+    from pandas import read_csv
+
+    counts = [0] * n_shards
+    for shard in range(n_shards):
+        os.makedirs(shard_path(shard_dir, shard), exist_ok=True)
+        # Write the header so empty shards still have a valid file
+        with open(shard_path(shard_dir, shard, out_name), "w") as out:
+            out.write(schema["sep"].join(columns) + "\n")
+
+    chunks = read_csv(
+        file,
+        sep=schema["sep"],
+        usecols=columns,
+        dtype={column: schema["dtype"][column] for column in columns},
+        chunksize=chunk_size,
+    )
+    for chunk in chunks:
+        chunk = chunk[columns]
+        shards = assign_shards(chunk[code_column], n_shards)
+        for shard, rows in chunk.groupby(shards):
+            rows.to_csv(
+                shard_path(shard_dir, shard, out_name),
+                sep=schema["sep"],
+                index=False,
+                header=False,
+                mode="a",
+            )
+            counts[shard] += len(rows)
+
+    return counts
+
+
+def split_datasets(
+    house_prices_file, property_tax_file, shard_dir, n_shards, chunk_size
+):
+    """
+    Split the raw house prices and property tax data into shards
+
+    :param house_prices_file: Path to CSV file containing raw house prices data
+    :param property_tax_file: Path to CSV file containing raw property tax data
+    :param shard_dir: Directory containing the shards
+    :param n_shards: Number of shards
+    :param chunk_size: Number of rows to read at a time
+
+    :return: None
+    """
+
+    import json
+    from shutil import rmtree
+    from uuid import uuid4
+
+    from pipeline import load_script
+    from schemas import RAW_HOUSE_PRICES, RAW_PROPERTY_TAX
+
+    house_prices = load_script("01-tidy-house-prices.py")
+    property_tax = load_script("01-tidy-property-tax.py")
+
+    # Remove the manifest first so an interrupted split is never processed,
+    # remove shards left over from an earlier split with more shards and the
+    # processed output of the shards that are kept
+    manifest_file = os.path.join(shard_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+    if os.path.isdir(shard_dir):
+        for name in os.listdir(shard_dir):
+            if not name.startswith("shard-"):
+                continue
+            if int(name.split("-")[1]) >= n_shards:
+                print(f"Removing old shard '{name}'...")
+                rmtree(os.path.join(shard_dir, name))
+                continue
+            for processed in PROCESSED_NAMES:
+                path = os.path.join(shard_dir, name, processed)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    print(f"Splitting house prices from '{house_prices_file}'...")
+    counts = split_raw(
+        house_prices_file,
+        RAW_HOUSE_PRICES,
+        house_prices.COLUMNS,
+        "COU",
+        "house-prices.csv",
+        shard_dir,
+        n_shards,
+        chunk_size,
+    )
+    print(f"House prices rows per shard: {counts}")
+
+    print(f"Splitting property tax from '{property_tax_file}'...")
+    counts = split_raw(
+        property_tax_file,
+        RAW_PROPERTY_TAX,
+        property_tax.COLUMNS,
+        "LOCATION",
+        "property-tax.csv",
+        shard_dir,
+        n_shards,
+        chunk_size,
+    )
+    print(f"Property tax rows per shard: {counts}")
+
+    with open(manifest_file, "w") as manifest:
+        json.dump({"shards": n_shards, "split": uuid4().hex}, manifest)
+
+
+def process_shard(shard_dir, shard, reference_file):
+    """
+    Tidy and combine the data in a single shard
+
+    :param shard_dir: Directory containing the shards
+    :param shard: Shard number
+    :param reference_file: Path to country reference table
+
+    :return: Path to the combined output for the shard
+    """
+
+    from pandas import DataFrame
+
+    from pipeline import load_script
+    from reference import load_reference
+    from schemas import COMBINED, RAW_HOUSE_PRICES, RAW_PROPERTY_TAX, read_table
+
+    house_prices = load_script("01-tidy-house-prices.py")
+    property_tax = load_script("01-tidy-property-tax.py")
+    combine = load_script("02-combine-datasets.py")
+
+    print(f"Processing shard {shard}...")
+    # Read the split id before the inputs so a split that happens while the
+    # shard is processed is detected when merging
+    split_id = read_manifest(shard_dir)["split"]
+    reference = load_reference(reference_file)
+    raw_house_prices = read_table(
+        shard_path(shard_dir, shard, "house-prices.csv"),
+        RAW_HOUSE_PRICES,
+        usecols=house_prices.COLUMNS,
+    )
+    raw_property_tax = read_table(
+        shard_path(shard_dir, shard, "property-tax.csv"),
+        RAW_PROPERTY_TAX,
+        usecols=property_tax.COLUMNS,
+    )
+
+    if raw_house_prices.empty or raw_property_tax.empty:
+        # No countries in this shard can be in the combined dataset
+        combined = DataFrame(columns=list(COMBINED["dtype"]))
+    else:
+        combined = combine.combine_datasets(
+            reference,
+            house_prices.tidy_house_prices(raw_house_prices),
+            property_tax.tidy_property_tax(raw_property_tax),
+        )
+
+    # Write to a temporary file first so a partial output is never merged
+    out_file = shard_path(shard_dir, shard, "combined.tsv")
+    combined.to_csv(f"{out_file}.tmp", sep="\t", index=False)
+    os.replace(f"{out_file}.tmp", out_file)
+    with open(shard_path(shard_dir, shard, "combined.split"), "w") as split:
+        split.write(split_id)
+
+    return out_file
+
+
+def read_manifest(shard_dir):
+    """
+    Read the manifest written by the split step
+
+    :param shard_dir: Directory containing the shards
+
+    :return: Dictionary with the number of "shards" and the "split" id
+    """
+
+    import json
+
+    manifest_file = os.path.join(shard_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_file):
+        raise ValueError(f"'{shard_dir}' has no manifest, run the split step first")
+    with open(manifest_file) as manifest:
+        return json.load(manifest)
+
+
+def list_shards(shard_dir):
+    """
+    List the shards in a shard directory
+
+    The shards are taken from the manifest written by the split step rather
+    than the directories that exist, which could include stale shards.
+
+    :param shard_dir: Directory containing the shards
+
+    :return: Sorted list of shard numbers
+    """
+
+    return list(range(read_manifest(shard_dir)["shards"]))
+
+
+def merge_shards(shard_dir):
+    """
+    Merge the combined output from every shard
+
+    Values are read as text so they are written out exactly as each shard
+    wrote them. Rows are sorted by country code and year so the result does
+    not depend on the number of shards. Every shard must have been processed
+    since the most recent split. The merged data is validated as a whole
+    because a country in more than one shard is not seen by any single shard.
+
+    :param shard_dir: Directory containing the shards
+
+    :return: DataFrame containing the merged data
+    """
+
+    from pandas import concat, read_csv
+
+    from schemas import COMBINED, validate
+
+    manifest = read_manifest(shard_dir)
+    shards = list(range(manifest["shards"]))
+    files = [shard_path(shard_dir, shard, "combined.tsv") for shard in shards]
+    missing = [file for file in files if not os.path.exists(file)]
+    if missing:
+        raise ValueError(f"Shards have not been processed: {missing}")
+
+    stale = []
+    for shard, file in zip(shards, files):
+        split_file = shard_path(shard_dir, shard, "combined.split")
+        split_id = None
+        if os.path.exists(split_file):
+            with open(split_file) as split:
+                split_id = split.read().strip()
+        if split_id != manifest["split"]:
+            stale.append(file)
+    if stale:
+        raise ValueError(f"Shards were processed before the last split: {stale}")
+
+    merged = concat(
+        [read_csv(file, sep="\t", dtype=str, keep_default_na=False) for file in files],
+        ignore_index=True,
+    )
+    merged = merged.sort_values(
+        by=["Code3", "Year"], key=lambda x: x.astype(int) if x.name == "Year" else x
+    )
+    validate(merged.mask(merged == "").astype(COMBINED["dtype"]), COMBINED)
+
+    return merged
+
+
+def main():
+    """The main script function"""
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    from docopt import docopt
+
+    args = docopt(__doc__)
+
+    shard_dir = args["--shard-dir"]
+
+    if args["split"]:
+        n_shards = int(args["--shards"])
+        chunk_size = int(args["--chunk-size"])
+        print(f"Splitting raw data into {n_shards} shards in '{shard_dir}'...")
+        split_datasets(
+            args["--house-prices"],
+            args["--property-tax"],
+            shard_dir,
+            n_shards,
+            chunk_size,
+        )
+    elif args["process"]:
+        available = list_shards(shard_dir)
+        shards = [int(shard) for shard in args["<shard>"]] or available
+        unknown = [shard for shard in shards if shard not in available]
+        if unknown:
+            raise ValueError(f"Shards not in '{shard_dir}': {unknown}")
+        workers = int(args["--workers"]) or None
+        print(f"Processing {len(shards)} shards...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            process = partial(
+                process_shard,
+                shard_dir,
+                reference_file=args["--reference"],
+            )
+            for out_file in executor.map(process, shards):
+                print(f"Wrote '{out_file}'")
+    elif args["merge"]:
+        out_file = args["--out-file"]
+        print(f"Merging shards in '{shard_dir}'...")
+        output = merge_shards(shard_dir)
+        print(output)
+        print(f"Writing output to '{out_file}'...")
+        output.to_csv(out_file, sep="\t", index=False)
+
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
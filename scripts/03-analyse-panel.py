@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+
+"""
+Calculate lagged correlations and panel regressions between every pair of variables
+
+For each pair of variables (X, Y) and each lag the value of X in a year is
+compared to the value of Y the given number of years later. Results are
+calculated for each country, for all countries pooled together and for a
+fixed effects (within country) panel regression of Y on X. Aggregates such as
+the OECD average are combinations of the other countries so they are reported
+as their own group but left out of the pooled and fixed effects results.
+
+Usage:
+    03-analyse-panel.py --out-file=<path> [options] <file>
+
+Options:
+    -h --help             Show this screen.
+    --out-file=<path>     Path to output file.
+    --max-lag=<int>       Maximum lag in years [default: 5].
+    --aggregates=<codes>  Comma-separated codes that are aggregates of other
+                          countries [default: OECD].
+"""
+
+
+def build_cube(combined, variables):
+    """
+    Convert the combined dataset to a country x year x variable array
+
+    :param combined: DataFrame containing combined dataset
+    :param variables: Names of the variables to include
+
+    :return: Tuple of country codes, years and the array, with NaN for
+        missing country and year combinations
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    codes = np.sort(combined["Code3"].astype(str).unique())
+    years = np.arange(combined["Year"].min(), combined["Year"].max() + 1)
+
+    index = pd.MultiIndex.from_product([codes, years], names=["Code3", "Year"])
+    values = combined.assign(Code3=combined["Code3"].astype(str))
+    values = values.set_index(["Code3", "Year"])[variables].reindex(index)
+
+    cube = values.to_numpy(dtype="float64").reshape(len(codes), len(years), -1)
+
+    return codes, years, cube
+
+
+def pair_sums(x, y):
+    """
+    Calculate the sums needed for correlations and regressions of all pairs
+
+    Only time points where both variables are present are used for each pair.
+    All pairs are calculated at once with einsum, the result has one entry for
+    each country and pair of variables.
+
+    :param x: Array of X values with shape (country, time, variable)
+    :param y: Array of Y values with shape (country, time, variable)
+
+    :return: Dictionary of arrays with shape (country, x variable, y variable)
+        containing the number of observations ("n"), centred sums of squares
+        ("xx", "yy") and centred sum of products ("xy")
+    """
+
+    import numpy as np
+
+    x_mask = (~np.isnan(x)).astype("float64")
+    y_mask = (~np.isnan(y)).astype("float64")
+    x = np.nan_to_num(x)
+    y = np.nan_to_num(y)
+
+    def pairs(a, b):
+        return np.einsum("ctv,ctw->cvw", a, b)
+
+    n = pairs(x_mask, y_mask)
+    sum_x = pairs(x, y_mask)
+    sum_y = pairs(x_mask, y)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sums = {
+            "n": n,
+            "xx": pairs(x**2, y_mask) - sum_x**2 / n,
+            "yy": pairs(x_mask, y**2) - sum_y**2 / n,
+            "xy": pairs(x, y) - sum_x * sum_y / n,
+        }
+
+    # Groups without observations contribute nothing to pooled sums
+    for name in ["xx", "yy", "xy"]:
+        sums[name] = np.where(n > 0, sums[name], 0)
+
+    return sums
+
+
+def regression_stats(n, xx, yy, xy, df):
+    """
+    Calculate correlation and simple regression statistics from centred sums
+
+    :param n: Number of observations
+    :param xx: Centred sum of squares for X
+    :param yy: Centred sum of squares for Y
+    :param xy: Centred sum of products
+    :param df: Residual degrees of freedom
+
+    :return: Dictionary of arrays
+    """
+
+    import numpy as np
+    from scipy.stats import t
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        correlation = xy / np.sqrt(xx * yy)
+        slope = xy / xx
+        residual_ss = np.maximum(yy - slope * xy, 0)
+        std_error = np.sqrt(residual_ss / df / xx)
+        p_value = 2 * t.sf(np.abs(slope / std_error), df)
+
+    valid = df > 0
+    stats = {
+        "N": n,
+        "Correlation": np.where(valid, correlation, np.nan),
+        "Slope": np.where(valid, slope, np.nan),
+        "StdError": np.where(valid, std_error, np.nan),
+        "PValue": np.where(valid, p_value, np.nan),
+    }
+
+    return stats
+
+
+def analyse_lag(cube, lag, members):
+    """
+    Calculate statistics for all pairs of variables at a single lag
+
+    :param cube: Array with shape (country, year, variable)
+    :param lag: Number of years between X and Y
+    :param members: Boolean array with one entry for each country, only
+        countries that are True are used for the pooled and fixed effects
+        results
+
+    :return: Dictionary of arrays with shape (group, x variable, y variable),
+        where the groups are each country followed by the pooled and fixed
+        effects results
+    """
+
+    import numpy as np
+
+    n_years = cube.shape[1]
+    x = cube[:, : n_years - lag, :]
+    y = cube[:, lag:, :]
+
+    sums = pair_sums(x, y)
+
+    # Pooled results, treat all member countries as a single group
+    pooled = pair_sums(
+        x[members].reshape(1, -1, x.shape[2]),
+        y[members].reshape(1, -1, y.shape[2]),
+    )
+
+    # Fixed effects results, the within-country sums are the per-country
+    # centred sums of the member countries added together
+    n_countries = (sums["n"][members] > 0).sum(axis=0)
+    within = {name: values[members].sum(axis=0) for name, values in sums.items()}
+
+    country_stats = regression_stats(
+        sums["n"], sums["xx"], sums["yy"], sums["xy"], sums["n"] - 2
+    )
+    pooled_stats = regression_stats(
+        pooled["n"][0],
+        pooled["xx"][0],
+        pooled["yy"][0],
+        pooled["xy"][0],
+        pooled["n"][0] - 2,
+    )
+    within_stats = regression_stats(
+        within["n"],
+        within["xx"],
+        within["yy"],
+        within["xy"],
+        within["n"] - n_countries - 1,
+    )
+
+    stats = {
+        name: np.concatenate(
+            [country_stats[name], pooled_stats[name][None], within_stats[name][None]]
+        )
+        for name in country_stats
+    }
+
+    return stats
+
+
+def analyse_panel(combined, max_lag=5, aggregates=("OECD",)):
+    """
+    Calculate lagged correlations and panel regressions for all variable pairs
+
+    :param combined: DataFrame containing combined dataset
+    :param max_lag: Maximum lag in years
+    :param aggregates: Codes that are aggregates of other countries, these
+        are reported as their own group but not used for the pooled and fixed
+        effects results
+
+    :return: DataFrame with one row for each pair of variables, lag and group
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    variables = [
+        column
+        for column in combined.columns
+        if column not in ["Code3", "Country", "CountryLabel", "Year"]
+    ]
+
+    print("Building country x year x variable array...")
+    codes, years, cube = build_cube(combined, variables)
+    print(f"Array has shape {cube.shape}")
+
+    members = ~np.isin(codes, list(aggregates))
+    if not members.all():
+        print(f"Leaving {', '.join(codes[~members])} out of the pooled results")
+
+    groups = np.concatenate([codes, ["Pooled", "FixedEffects"]])
+    group_idx, x_idx, y_idx = np.meshgrid(
+        np.arange(len(groups)),
+        np.arange(len(variables)),
+        np.arange(len(variables)),
+        indexing="ij",
+    )
+    # Comparing a variable to itself is not informative
+    keep = (x_idx != y_idx).ravel()
+
+    results = []
+    for lag in range(max_lag + 1):
+        print(f"Calculating statistics for lag {lag}...")
+        stats = analyse_lag(cube, lag, members)
+        result = pd.DataFrame(
+            {
+                "XVar": np.array(variables)[x_idx.ravel()[keep]],
+                "YVar": np.array(variables)[y_idx.ravel()[keep]],
+                "Lag": lag,
+                "Group": groups[group_idx.ravel()[keep]],
+            }
+        )
+        for name, values in stats.items():
+            result[name] = values.ravel()[keep]
+        results.append(result)
+
+    results = pd.concat(results, ignore_index=True)
+    results["N"] = results["N"].astype(int)
+
+    return results
+
+
+def main():
+    """The main script function"""
+    from docopt import docopt
+
+    from schemas import COMBINED, read_table
+
+    args = docopt(__doc__)
+
+    file = args["<file>"]
+    out_file = args["--out-file"]
+    max_lag = int(args["--max-lag"])
+    aggregates = [code for code in args["--aggregates"].split(",") if code]
+
+    print(f"Reading data from '{file}'...")
+    input = read_table(
+        file,
+        COMBINED,
+        usecols=[
+            column
+            for column in COMBINED["dtype"]
+            if column not in ["Country", "CountryLabel"]
+        ],
+    )
+    print(input)
+    output = analyse_panel(input, max_lag, aggregates)
+    print(output)
+    print(f"Writing output to '{out_file}'...")
+    output.to_csv(out_file, sep="\t", index=False)
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
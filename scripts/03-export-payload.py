@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+Export the combined dataset as a compact JSON payload for the interactive report
+
+Usage:
+    03-export-payload.py --out-file=<path> [options] <file>
+
+Options:
+    -h --help            Show this screen.
+    --out-file=<path>    Path to output file.
+    --digits=<int>       Number of decimal places to keep for values [default: 3].
+"""
+
+
+def export_payload(combined, digits=3):
+    """
+    Convert the combined dataset to a compact columnar payload
+
+    Country information is stored once per country and each row only refers to
+    its country by index. Values are stored as one array per variable.
+
+    :param combined: DataFrame containing combined dataset
+    :param digits: Number of decimal places to keep for values
+
+    :return: Dictionary that can be written as JSON
+    """
+
+    import pandas as pd
+
+    from styles import resolve_colours
+
+    print("Encoding countries...")
+    countries = combined[["Code3", "CountryLabel"]].drop_duplicates("Code3")
+    countries = countries.sort_values(by="Code3").reset_index(drop=True)
+    # Set colours to highlight countries of interest
+    countries["Colour"] = resolve_colours(countries["Code3"])
+    country_index = pd.Categorical(combined["Code3"], categories=countries["Code3"])
+
+    print("Encoding values...")
+    value_vars = [
+        column
+        for column in combined.columns
+        if column not in ["Code3", "Country", "CountryLabel", "Year"]
+    ]
+    values = {
+        var: combined[var].astype("float64").round(digits).tolist()
+        for var in value_vars
+    }
+
+    payload = {
+        "version": 1,
+        "countries": countries.to_dict(orient="list"),
+        "rows": {
+            "country": country_index.codes.tolist(),
+            "year": combined["Year"].astype(int).tolist(),
+        },
+        "values": values,
+    }
+
+    return payload
+
+
+def main():
+    """The main script function"""
+    import json
+
+    from docopt import docopt
+
+    from schemas import COMBINED, read_table
+
+    args = docopt(__doc__)
+
+    file = args["<file>"]
+    out_file = args["--out-file"]
+    digits = int(args["--digits"])
+
+    print(f"Reading data from '{file}'...")
+    input = read_table(
+        file,
+        COMBINED,
+        usecols=[column for column in COMBINED["dtype"] if column != "Country"],
+    )
+    print(input)
+    output = export_payload(input, digits)
+    print(f"Writing output to '{out_file}'...")
+    with open(out_file, "w") as file:
+        json.dump(output, file, separators=(",", ":"))
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
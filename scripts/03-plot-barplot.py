@@ -4,13 +4,17 @@
 Plot a bar plot showing the current value of a variable by country and the change over time
 
 Usage:
-    03-plot-barplot.py --out-file=<path> --var=<str> --label=<str> [options] <file>
+    03-plot-barplot.py --out-file=<path> --var=<str> --label=<str> [--variant=<spec>]... [options] <file>
 
 Options:
     -h --help            Show this screen.
     --out-file=<path>    Path to output file.
+    --dpi=<list>         Comma-separated raster resolutions, the first is used for the output file [default: 100,200].
+    --stream             Read the input in chunks, keeping only the first and last year for each country.
+    --chunk-size=<int>   Number of rows to read at a time with --stream [default: 100000].
     --var=<str>          Name of the variable to plot.
     --label=<str>        Label for the variable.
+    --variant=<spec>     Also save a copy highlighting other countries, given as NAME:CODE,CODE,...
 """
 
 
@@ -18,62 +22,58 @@ def plot_barplot(combined, var, label):
     """
     Plot bar plot
 
-    :param combined: DataFrame containing combined dataset
+    :param combined: DataFrame containing combined dataset, with categorical
+        country codes
     :param var: Name of the variable to plot
     :param label: Label for the variable
 
     :return: matplotlib figure object
     """
 
-    import matplotlib.pyplot as plt
-    import pandas as pd
-    import seaborn as sns
+    from figures import figure_style, new_figure
+    from styles import resolve_colours
 
-    # Set seaborn style
-    sns.set_style("whitegrid")
-    sns.set_context("talk")
+    # Order countries by their most recent value, the input is not modified so
+    # it can be shared between figures
+    order_data = combined[combined["Year"] == max(combined["Year"])]
+    order_data = order_data.sort_values(by=var, ascending=False)
+    order = list(order_data["CountryLabel"])
+    # Colours are resolved once for each country category
+    colours = resolve_colours(combined["Code3"].cat.categories)
+    colours = list(colours[order_data["Code3"].cat.codes])
 
-    fig, axs = plt.subplots(ncols=2)
+    with figure_style():
+        fig, axs = new_figure(ncols=2)
 
-    fig.tight_layout(pad=0)
+        fig.tight_layout(pad=0)
 
-    plt.subplots_adjust(wspace=0.1)
+        fig.subplots_adjust(wspace=0.1)
 
-    order_data = combined[combined["Year"] == max(combined["Year"])]
-    order_data = order_data.sort_values(by=var, ascending=False)
-    combined["Code3"] = pd.Categorical(
-        combined["Code3"], categories=order_data["Code3"]
-    )
-    combined["CountryLabel"] = pd.Categorical(
-        combined["CountryLabel"], categories=order_data["CountryLabel"]
-    )
-    combined.sort_values(by=["Code3", "Year"], inplace=True)
-
-    colours = get_colours(combined)
-    plot_current(combined, var, label, colours, ax=axs[0])
-    plot_change(combined, var, label, colours, ax=axs[1])
-
-    # Add source
-    fig.text(
-        x=0.08,
-        y=0.01,
-        s="Source: OECD, https://stats.oecd.org/",
-        fontsize=10,
-        color="grey",
-    )
+        plot_current(combined, var, label, order, colours, ax=axs[0])
+        plot_change(combined, var, label, order, colours, ax=axs[1])
 
-    fig.set_size_inches(16, 10)
+        # Add source
+        fig.text(
+            x=0.08,
+            y=0.01,
+            s="Source: OECD, https://stats.oecd.org/",
+            fontsize=10,
+            color="grey",
+        )
+
+        fig.set_size_inches(16, 10)
 
     return fig
 
 
-def plot_current(combined, var, label, colours, ax=None):
+def plot_current(combined, var, label, order, colours, ax=None):
     """
     Plot bar plot of current values
 
     :param combined: DataFrame containing combined dataset
     :param var: Name of the variable to plot
     :param label: Label for the variable
+    :param order: List of country labels in the order to plot them
     :param colours: List of colours for each country
     :param ax: matplotlib axes object to use
 
@@ -82,11 +82,23 @@ def plot_current(combined, var, label, colours, ax=None):
 
     import seaborn as sns
 
+    from styles import BAR_SATURATION
+
     # Filter to most recent year
     plot_data = combined[combined["Year"] == max(combined["Year"])]
+    plot_data = plot_data.set_index("CountryLabel").loc[order].reset_index()
 
     # Plot bar chart
-    sns.barplot(x=var, y="CountryLabel", data=plot_data, palette=colours, ax=ax)
+    sns.barplot(
+        x=var,
+        y="CountryLabel",
+        data=plot_data,
+        order=order,
+        palette=colours,
+        saturation=BAR_SATURATION,
+        ax=ax,
+    )
+    tag_bars(ax, plot_data["Code3"])
 
     ax.axvline(x=0, color="black")
 
@@ -95,23 +107,20 @@ def plot_current(combined, var, label, colours, ax=None):
     ax.set(xlabel=None, ylabel=None, yticklabels=[])
 
     # Label bars
-    limits = label_bars(
-        ax,
-        labels=plot_data["CountryLabel"].cat.categories,
-        values=list(plot_data[var]),
-    )
+    limits = label_bars(ax, labels=order, values=list(plot_data[var]))
     ax.set_xlim(limits[0], limits[1])
 
     return ax
 
 
-def plot_change(combined, var, label, colours, ax=None):
+def plot_change(combined, var, label, order, colours, ax=None):
     """
     Plot bar plot of changes
 
     :param combined: DataFrame containing combined dataset
     :param var: Name of the variable to plot
     :param label: Label for the variable
+    :param order: List of country labels in the order to plot them
     :param colours: List of colours for each country
     :param ax: matplotlib axes object to use
 
@@ -121,8 +130,10 @@ def plot_change(combined, var, label, colours, ax=None):
     import seaborn as sns
     import pandas as pd
 
+    from styles import BAR_SATURATION
+
     # Calculate change for each country
-    plot_data = combined.groupby("Code3", sort=False).apply(
+    plot_data = combined.groupby("Code3", sort=False, observed=True).apply(
         lambda x: pd.Series(
             data=[
                 x["Code3"].iloc[0],
@@ -134,14 +145,19 @@ def plot_change(combined, var, label, colours, ax=None):
         )
     )
     plot_data["Change"] = plot_data["Last"] - plot_data["First"]
-    plot_data["CountryLabel"] = pd.Categorical(
-        plot_data["CountryLabel"], categories=combined["CountryLabel"].cat.categories
-    )
+    plot_data = plot_data.set_index("CountryLabel").loc[order].reset_index()
 
     # Plot bar chart
     ax = sns.barplot(
-        x="Change", y="CountryLabel", data=plot_data, palette=colours, ax=ax
+        x="Change",
+        y="CountryLabel",
+        data=plot_data,
+        order=order,
+        palette=colours,
+        saturation=BAR_SATURATION,
+        ax=ax,
     )
+    tag_bars(ax, plot_data["Code3"])
 
     ax.axvline(x=0, color="black")
 
@@ -150,34 +166,26 @@ def plot_change(combined, var, label, colours, ax=None):
     ax.set(xlabel=None, ylabel=None, yticklabels=[])
 
     # Label bars
-    limits = label_bars(
-        ax, labels=plot_data["CountryLabel"].cat.categories, values=plot_data["Change"]
-    )
+    limits = label_bars(ax, labels=order, values=list(plot_data["Change"]))
     ax.set_xlim(limits[0], limits[1])
 
     return ax
 
 
-def get_colours(plot_data):
+def tag_bars(ax, codes):
     """
-    Get country colours
+    Set the gid of each bar to its country so the figure can be re-coloured
 
-    :param plot_data: DataFrame containing the data to plot
+    :param ax: matplotlib axes object containing the bars
+    :param codes: Country codes in the order the bars are plotted
 
-    :return: List of colours for each country
+    :return: None
     """
 
-    # Set colours to highlight countries of interest
-    colours = [
-        "#E89611"
-        if country in ["NZL", "SWE", "CAN", "JPN"]
-        else "#1C4EAA"
-        if country == "OECD"
-        else "#374043"
-        for country in plot_data["Code3"].cat.categories
-    ]
+    from styles import country_gid
 
-    return colours
+    for patch, code in zip(ax.patches, codes):
+        patch.set_gid(country_gid("bar", code, ax))
 
 
 def label_bars(ax, labels, values):
@@ -261,23 +269,43 @@ def label_bars(ax, labels, values):
 def main():
     """The main script function"""
     from docopt import docopt
-    from pandas import read_csv
+
+    from figures import figure_style, parse_dpis, save_figure, save_variants
+    from schemas import COMBINED, read_table, read_table_extremes
 
     args = docopt(__doc__)
 
     file = args["<file>"]
     out_file = args["--out-file"]
+    dpis = parse_dpis(args["--dpi"])
     var = args["--var"]
     label = args["--label"]
-
-    print(f"Reading data from '{file}'...")
-    input = read_csv(file, sep="\t")
+    variants = args["--variant"]
+    stream = args["--stream"]
+    chunk_size = int(args["--chunk-size"])
+
+    usecols = ["Code3", "CountryLabel", "Year", var]
+    if stream:
+        # The plots only use the first and last year for each country
+        print(f"Reading first and last years from '{file}'...")
+        input = read_table_extremes(
+            file, COMBINED, "Code3", "Year", usecols=usecols, chunk_size=chunk_size
+        )
+    else:
+        print(f"Reading data from '{file}'...")
+        input = read_table(file, COMBINED, usecols=usecols)
     print(input)
     print(f"Plotting bar plot of {var} ({label})...")
     output = plot_barplot(input, var, label)
     print(output)
     print(f"Writing output to '{out_file}'...")
-    output.savefig(out_file, bbox_inches="tight")
+    # Some settings are read again when the figure is drawn
+    with figure_style():
+        written = save_figure(output, out_file, dpis=dpis)
+        if variants:
+            print(f"Writing {len(variants)} variant(s)...")
+            written += save_variants(output, out_file, variants, dpis=dpis)
+    print(f"Wrote {len(written)} changed file(s)")
     print("Done!")
 
 
@@ -4,23 +4,31 @@
 Plot a scatter plot showing the relationship between two variables by country (for both current values and changes)
 
 Usage:
-    03-plot-scatterplot.py --out-file=<path> --x-var=<str> --x-label=<str> --y-var=<str> --y-label=<str> [options] <file>
+    03-plot-scatterplot.py --out-file=<path> --x-var=<str> --x-label=<str> --y-var=<str> --y-label=<str> [--variant=<spec>]... [options] <file>
 
 Options:
     -h --help            Show this screen.
     --out-file=<path>    Path to output file.
+    --dpi=<list>         Comma-separated raster resolutions, the first is used for the output file [default: 100,200].
+    --stream             Read the input in chunks, keeping only the first and last year for each country.
+    --chunk-size=<int>   Number of rows to read at a time with --stream [default: 100000].
     --x-var=<str>        Name of the variable to plot on the x-axis.
     --x-label=<str>      Label for the variable on the x-axis.
     --y-var=<str>        Name of the variable to plot on the y-axis.
     --y-label=<str>      Label for the variable on the y-axis.
+    --variant=<spec>     Also save a copy highlighting other countries, given as NAME:CODE,CODE,...
 """
 
+# Number of iterations used to move overlapping labels
+LABEL_ITERATIONS = 500
+
 
 def plot_scatter(combined, x_var, x_label, y_var, y_label):
     """
     Plot scatter plot
 
-    :param combined: DataFrame containing combined dataset
+    :param combined: DataFrame containing combined dataset, with categorical
+        country codes
     :param x_var: Name of the variable to plot on the x-axis
     :param x_label: Label for the variable on the x-axis
     :param y_var: Name of the variable to plot on the x-axis
@@ -29,39 +37,46 @@ def plot_scatter(combined, x_var, x_label, y_var, y_label):
     :return: matplotlib figure object
     """
 
-    import matplotlib.pyplot as plt
-    import seaborn as sns
+    from figures import figure_style, new_figure
+    from styles import LABEL_STYLES, resolve_colours, resolve_groups
 
-    # Set seaborn style
-    sns.set_style("whitegrid")
-    sns.set_context("talk")
+    # Styles are resolved once for each country category, the input is not
+    # modified so it can be shared between figures
+    categories = combined["Code3"].cat.categories
+    styles = {
+        "colours": resolve_colours(categories),
+        "labels": [LABEL_STYLES[group] for group in resolve_groups(categories)],
+    }
 
-    fig, axs = plt.subplots(ncols=2)
+    with figure_style():
+        fig, axs = new_figure(ncols=2)
 
-    fig.tight_layout(pad=0)
+        fig.tight_layout(pad=0)
 
-    plt.subplots_adjust(wspace=0.2)
+        fig.subplots_adjust(wspace=0.2)
 
-    combined["Code3"] = combined["Code3"].astype("category")
-    colours = get_colours(combined)
-    plot_current(combined, x_var, x_label, y_var, y_label, colours, ax=axs[0])
-    plot_change(combined, x_var, x_label, y_var, y_label, colours, ax=axs[1])
+        plot_current(combined, x_var, x_label, y_var, y_label, styles, ax=axs[0])
+        plot_change(combined, x_var, x_label, y_var, y_label, styles, ax=axs[1])
 
-    # Add source
-    fig.text(
-        x=0.03,
-        y=-0.02,
-        s="Source: OECD, https://stats.oecd.org/",
-        fontsize=10,
-        color="grey",
-    )
+        # Add source
+        fig.text(
+            x=0.03,
+            y=-0.02,
+            s="Source: OECD, https://stats.oecd.org/",
+            fontsize=10,
+            color="grey",
+        )
+
+        fig.set_size_inches(16, 8)
 
-    fig.set_size_inches(16, 8)
+        # Labels are moved once the figure has its final size
+        for ax in axs:
+            adjust_labels(ax)
 
     return fig
 
 
-def plot_current(combined, x_var, x_label, y_var, y_label, colours, ax=None):
+def plot_current(combined, x_var, x_label, y_var, y_label, styles, ax=None):
     """
     Plot scatter plot of current values
 
@@ -70,7 +85,8 @@ def plot_current(combined, x_var, x_label, y_var, y_label, colours, ax=None):
     :param x_label: Label for the variable on the x-axis
     :param y_var: Name of the variable to plot on the x-axis
     :param y_label: Label for the variable on the x-axis
-    :param colours: List of colours for each country
+    :param styles: Dictionary with the "colours" and "labels" (text
+        properties) for each country, indexed by the country category codes
     :param ax: matplotlib axes object to use
 
     :return: matplotlib axes object
@@ -80,18 +96,34 @@ def plot_current(combined, x_var, x_label, y_var, y_label, colours, ax=None):
 
     # Filter to most recent year
     plot_data = combined[combined["Year"] == max(combined["Year"])]
+    plot_data = plot_data.sort_values(by="Code3")
+    categories = plot_data["Code3"].cat.codes.to_numpy()
 
     # Plot scatter plot
+    plot_points(
+        plot_data[x_var],
+        plot_data[y_var],
+        plot_data["Code3"],
+        styles["colours"][categories],
+        ax=ax,
+    )
     sns.regplot(
         x=x_var,
         y=y_var,
-        scatter_kws={"color": colours},
+        scatter=False,
         line_kws={"color": "#7ea8be"},
         data=plot_data,
         ax=ax,
         seed=1,
     )
-    label_points(plot_data[x_var], plot_data[y_var], plot_data["Code3"], colours, ax=ax)
+    label_points(
+        plot_data[x_var],
+        plot_data[y_var],
+        plot_data["Code3"],
+        styles["colours"][categories],
+        [styles["labels"][category] for category in categories],
+        ax=ax,
+    )
 
     # Add title and labels
     ax.set_title(f"Comparison of current values", loc="left")
@@ -100,7 +132,7 @@ def plot_current(combined, x_var, x_label, y_var, y_label, colours, ax=None):
     return ax
 
 
-def plot_change(combined, x_var, x_label, y_var, y_label, colours, ax=None):
+def plot_change(combined, x_var, x_label, y_var, y_label, styles, ax=None):
     """
     Plot change in Real Price Index
 
@@ -109,7 +141,8 @@ def plot_change(combined, x_var, x_label, y_var, y_label, colours, ax=None):
     :param x_label: Label for the variable on the x-axis
     :param y_var: Name of the variable to plot on the x-axis
     :param y_label: Label for the variable on the x-axis
-    :param colours: List of colours for each country
+    :param styles: Dictionary with the "colours" and "labels" (text
+        properties) for each country, indexed by the country category codes
     :param ax: matplotlib axes object to use
 
     :return: matplotlib axes object
@@ -119,7 +152,7 @@ def plot_change(combined, x_var, x_label, y_var, y_label, colours, ax=None):
     import pandas as pd
 
     # Calculate changes by country
-    plot_data = combined.groupby("Code3", sort=False).apply(
+    plot_data = combined.groupby("Code3", observed=True).apply(
         lambda x: pd.Series(
             data=[
                 x["Code3"].iloc[0],
@@ -134,19 +167,33 @@ def plot_change(combined, x_var, x_label, y_var, y_label, colours, ax=None):
     )
     plot_data["xChange"] = plot_data["xLast"] - plot_data["xFirst"]
     plot_data["yChange"] = plot_data["yLast"] - plot_data["yFirst"]
+    # Groups are indexed by the country categories
+    categories = plot_data.index.codes
 
     # Plot scatter plot
+    plot_points(
+        plot_data["xChange"],
+        plot_data["yChange"],
+        plot_data["Code3"],
+        styles["colours"][categories],
+        ax=ax,
+    )
     sns.regplot(
         x="xChange",
         y="yChange",
-        scatter_kws={"color": colours},
+        scatter=False,
         line_kws={"color": "#7ea8be"},
         data=plot_data,
         ax=ax,
         seed=1,
     )
     label_points(
-        plot_data["xChange"], plot_data["yChange"], plot_data["Code3"], colours, ax=ax
+        plot_data["xChange"],
+        plot_data["yChange"],
+        plot_data["Code3"],
+        styles["colours"][categories],
+        [styles["labels"][category] for category in categories],
+        ax=ax,
     )
 
     # Add title and labels
@@ -159,49 +206,91 @@ def plot_change(combined, x_var, x_label, y_var, y_label, colours, ax=None):
     return ax
 
 
-def get_colours(plot_data):
+def plot_points(x, y, codes, colours, ax):
     """
-    Get country colours
+    Plot a point for each country
 
-    :param plot_data: DataFrame containing the data to plot
+    All points are drawn as a single collection with a gid and the country of
+    each point so the figure can be re-coloured. The style matches the points
+    drawn by seaborn.regplot().
 
-    :return: List of colours for each country
+    :param x: x-coordinates of the points
+    :param y: y-coordinates of the points
+    :param codes: Country code for each point
+    :param colours: Colour for each point
+    :param ax: matplotlib axes object to use
+
+    :return: matplotlib axes object
     """
 
-    # Set colours to highlight countries of interest
-    colours = [
-        "#E89611"
-        if country in ["NZL", "SWE", "CAN", "JPN"]
-        else "#1C4EAA"
-        if country == "OECD"
-        else "#374043"
-        for country in plot_data["Code3"].cat.categories
-    ]
+    import matplotlib as mpl
 
-    return colours
+    from styles import countries_gid
 
+    points = ax.scatter(
+        x,
+        y,
+        color=list(colours),
+        marker="o",
+        linewidths=mpl.rcParams["lines.markeredgewidth"],
+        alpha=0.8,
+        gid=countries_gid("points", ax),
+    )
+    points.country_codes = [str(code) for code in codes]
 
-def label_points(x, y, labels, colours, ax):
+    return ax
 
-    from adjustText import adjust_text
-    from numpy.random import seed
 
-    seed(1)
+def label_points(x, y, labels, colours, styles, ax):
+    """
+    Label points on a scatter plot
+
+    The labels are placed on the points, adjust_labels() moves them so they do
+    not overlap once the figure is finished.
+
+    :param x: x-coordinates of the points
+    :param y: y-coordinates of the points
+    :param labels: Labels for each point, these are the country codes
+    :param colours: Colours for each label
+    :param styles: Dictionary of text properties for each label
+    :param ax: matplotlib axes object to use
+
+    :return: matplotlib axes object
+    """
+
+    from styles import country_gid
 
-    texts = []
     for point in range(len(x)):
-        texts.append(
-            ax.text(
-                x.iloc[point],
-                y.iloc[point],
-                labels.iloc[point],
-                color=colours[point],
-                fontsize=12,
-            )
+        ax.text(
+            x.iloc[point],
+            y.iloc[point],
+            labels.iloc[point],
+            color=colours[point],
+            gid=country_gid("label", labels.iloc[point], ax),
+            **styles[point],
         )
 
-    # Automatically adjust text positions
-    adjust_text(texts, expand_points=(1.2, 1.2), ax=ax)
+    return ax
+
+
+def adjust_labels(ax):
+    """
+    Move the point labels on a scatter plot so they do not overlap
+
+    adjust_text() measures the labels with Figure.draw_without_rendering()
+    rather than pyplot so this is safe to use from other threads. A fixed
+    number of iterations is used so the result does not depend on how busy
+    the machine is.
+
+    :param ax: matplotlib axes object containing labels from label_points()
+
+    :return: matplotlib axes object
+    """
+
+    from adjustText import adjust_text
+
+    texts = [text for text in ax.texts if (text.get_gid() or "").startswith("label-")]
+    adjust_text(texts, expand=(1.2, 1.2), iter_lim=LABEL_ITERATIONS, ax=ax)
 
     return ax
 
@@ -209,25 +298,45 @@ def label_points(x, y, labels, colours, ax):
 def main():
     """The main script function"""
     from docopt import docopt
-    from pandas import read_csv
+
+    from figures import figure_style, parse_dpis, save_figure, save_variants
+    from schemas import COMBINED, read_table, read_table_extremes
 
     args = docopt(__doc__)
 
     file = args["<file>"]
     out_file = args["--out-file"]
+    dpis = parse_dpis(args["--dpi"])
     x_var = args["--x-var"]
     x_label = args["--x-label"]
     y_var = args["--y-var"]
     y_label = args["--y-label"]
-
-    print(f"Reading data from '{file}'...")
-    input = read_csv(file, sep="\t")
+    variants = args["--variant"]
+    stream = args["--stream"]
+    chunk_size = int(args["--chunk-size"])
+
+    usecols = ["Code3", "CountryLabel", "Year", x_var, y_var]
+    if stream:
+        # The plots only use the first and last year for each country
+        print(f"Reading first and last years from '{file}'...")
+        input = read_table_extremes(
+            file, COMBINED, "Code3", "Year", usecols=usecols, chunk_size=chunk_size
+        )
+    else:
+        print(f"Reading data from '{file}'...")
+        input = read_table(file, COMBINED, usecols=usecols)
     print(input)
     print(f"Plotting scatter plot of {x_var} ({x_label}) vs {y_var} ({y_label})...")
     output = plot_scatter(input, x_var, x_label, y_var, y_label)
     print(output)
     print(f"Writing output to '{out_file}'...")
-    output.savefig(out_file, bbox_inches="tight")
+    # Some settings are read again when the figure is drawn
+    with figure_style():
+        written = save_figure(output, out_file, dpis=dpis)
+        if variants:
+            print(f"Writing {len(variants)} variant(s)...")
+            written += save_variants(output, out_file, variants, dpis=dpis)
+    print(f"Wrote {len(written)} changed file(s)")
     print("Done!")
 
 
@@ -0,0 +1,313 @@
+"""
+Shared figure output functions used by the plotting scripts
+
+Each figure is rendered once to a vector file and once to a high-resolution
+raster. Lower resolution rasters are derived from that raster instead of
+drawing the figure again. Files are only written when their content has changed
+so unchanged images keep their timestamps.
+
+Figures are created as Figure objects with their own Agg canvas rather than
+through pyplot so they can be built from different threads. matplotlib settings
+are still global and are read both when artists are created and when a figure
+is drawn, so figures are built and saved inside figure_style(). Threads using
+the same style share it and run at the same time, a thread asking for a
+different style waits until the settings are no longer in use.
+"""
+
+import os
+from contextlib import contextmanager
+from threading import Condition
+
+# Padding around the tight bounding box, same as the matplotlib default
+PAD_INCHES = 0.1
+
+# Salt for the ids in SVG files so the output only changes when the figure does
+SVG_HASH_SALT = "oecd-housing"
+
+# matplotlib rcParams are shared by the whole process so the style that is
+# currently applied, and how many threads are using it, is tracked here
+STYLE_CONDITION = Condition()
+STYLE_STATE = {"key": None, "users": 0, "settings": None}
+
+
+@contextmanager
+def figure_style(style="whitegrid", context="talk"):
+    """
+    Apply a seaborn style and context while building and saving a figure
+
+    Styles are applied when artists are created and some settings are read
+    again when a figure is drawn, so everything from creating a figure to
+    saving it should happen inside this block. The settings are applied by the
+    first thread to enter and restored when the last thread leaves, threads
+    asking for a different style wait until then. Blocks can be nested but
+    only with the same style.
+
+    :param style: Name of the seaborn style
+    :param context: Name of the seaborn plotting context
+    """
+
+    from contextlib import ExitStack
+
+    import matplotlib as mpl
+    import seaborn as sns
+
+    key = (style, context)
+    with STYLE_CONDITION:
+        STYLE_CONDITION.wait_for(
+            lambda: STYLE_STATE["users"] == 0 or STYLE_STATE["key"] == key
+        )
+        if STYLE_STATE["users"] == 0:
+            settings = ExitStack()
+            settings.enter_context(mpl.rc_context({"svg.hashsalt": SVG_HASH_SALT}))
+            settings.enter_context(sns.axes_style(style))
+            settings.enter_context(sns.plotting_context(context))
+            STYLE_STATE.update(key=key, settings=settings)
+        STYLE_STATE["users"] += 1
+
+    try:
+        yield
+    finally:
+        with STYLE_CONDITION:
+            STYLE_STATE["users"] -= 1
+            if STYLE_STATE["users"] == 0:
+                STYLE_STATE["settings"].close()
+                STYLE_STATE.update(key=None, settings=None)
+                STYLE_CONDITION.notify_all()
+
+
+def new_figure(ncols=1):
+    """
+    Create a figure with its own Agg canvas, without using pyplot
+
+    :param ncols: Number of subplot columns
+
+    :return: Tuple of the figure and array of axes
+    """
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    axs = fig.subplots(ncols=ncols)
+
+    return fig, axs
+
+
+def parse_dpis(value):
+    """
+    Parse a comma-separated list of resolutions
+
+    :param value: String such as "100,200"
+
+    :return: List of integer resolutions, in the order given
+    """
+
+    dpis = [int(dpi) for dpi in value.split(",") if dpi.strip()]
+    if not dpis:
+        raise ValueError(f"No resolutions given in '{value}'")
+
+    return dpis
+
+
+def output_paths(out_file, dpis):
+    """
+    Get the paths of all the files written for a figure
+
+    :param out_file: Path to the main raster output file
+    :param dpis: List of raster resolutions, the first is written to out_file
+
+    :return: Dictionary with "vector" and "rasters" (a dictionary of resolution
+        to path) entries
+    """
+
+    out_dir, name = os.path.split(out_file)
+    stem = os.path.splitext(name)[0]
+
+    rasters = {dpis[0]: out_file}
+    for dpi in dpis[1:]:
+        rasters[dpi] = os.path.join(out_dir, f"{stem}-{dpi}dpi.png")
+
+    paths = {
+        "vector": os.path.join(out_dir, f"{stem}.svg"),
+        "rasters": rasters,
+    }
+
+    return paths
+
+
+def get_layout_bbox(fig):
+    """
+    Compute the tight bounding box of a figure
+
+    This replaces savefig(bbox_inches="tight"), which draws the figure an
+    extra time for every file that is saved. The extents are measured with the
+    canvas renderer without drawing, so the layout must already be final
+    (tight_layout() and adjust_text() have been applied) and each figure is
+    only drawn for the vector and raster files.
+
+    :param fig: matplotlib figure object
+
+    :return: Bounding box in inches
+    """
+
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(PAD_INCHES)
+
+    return bbox
+
+
+def write_if_changed(path, data):
+    """
+    Write bytes to a file unless it already has the same content
+
+    :param path: Path to the output file
+    :param data: Bytes to write
+
+    :return: True if the file was written, False if it was unchanged
+    """
+
+    from hashlib import sha256
+
+    digest = sha256(data).hexdigest()
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            if sha256(file.read()).hexdigest() == digest:
+                return False
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Write to a temporary file first so readers never see a partial image
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+    return True
+
+
+def encode_png(image):
+    """
+    Encode an image as an optimised PNG
+
+    The figures only use a handful of flat colours so reducing them to a
+    256 colour palette is visually lossless and much smaller than RGBA.
+
+    :param image: PIL image object
+
+    :return: PNG bytes
+    """
+
+    from io import BytesIO
+
+    from PIL import Image
+
+    image = image.convert("RGB").quantize(256, method=Image.Quantize.FASTOCTREE)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+
+    return buffer.getvalue()
+
+
+def variant_path(out_file, name):
+    """
+    Get the path of the main raster file for a figure variant
+
+    :param out_file: Path to the main raster output file
+    :param name: Name of the variant
+
+    :return: Path string
+    """
+
+    stem, ext = os.path.splitext(out_file)
+
+    return f"{stem}-{name}{ext}"
+
+
+def save_figure(fig, out_file, dpis=(100,)):
+    """
+    Save a figure as a vector file and rasters at several resolutions
+
+    This draws the figure so it should be called inside figure_style() with the
+    style the figure was built with.
+
+    :param fig: matplotlib figure object
+    :param out_file: Path to the main raster output file
+    :param dpis: List of raster resolutions, the first is written to out_file
+
+    :return: List of paths that were written (unchanged files are skipped)
+    """
+
+    from io import BytesIO
+
+    from PIL import Image
+
+    paths = output_paths(out_file, list(dpis))
+    written = []
+
+    bbox = get_layout_bbox(fig)
+
+    # Render the vector version, with no date so the output only changes when
+    # the figure does (the ids are salted by figure_style())
+    vector = BytesIO()
+    fig.savefig(vector, format="svg", bbox_inches=bbox, metadata={"Date": None})
+
+    # Render the raster once at the highest resolution
+    max_dpi = max(dpis)
+    buffer = BytesIO()
+    fig.savefig(
+        buffer,
+        format="png",
+        dpi=max_dpi,
+        bbox_inches=bbox,
+        metadata={"Software": None},
+    )
+
+    if write_if_changed(paths["vector"], vector.getvalue()):
+        written.append(paths["vector"])
+
+    buffer.seek(0)
+    full = Image.open(buffer)
+    full.load()
+
+    # Derive the other resolutions by resampling
+    for dpi, path in paths["rasters"].items():
+        image = full
+        if dpi != max_dpi:
+            size = (
+                round(full.width * dpi / max_dpi),
+                round(full.height * dpi / max_dpi),
+            )
+            image = full.resize(size, Image.Resampling.LANCZOS)
+        if write_if_changed(path, encode_png(image)):
+            written.append(path)
+
+    return written
+
+
+def save_variants(fig, out_file, variants, dpis=(100,)):
+    """
+    Save re-coloured variants of a figure that highlight other countries
+
+    The figure is only re-coloured for each variant, not built again, and the
+    default colours are restored afterwards. Like save_figure() this should be
+    called inside figure_style().
+
+    :param fig: matplotlib figure object
+    :param out_file: Path to the main raster output file of the figure
+    :param variants: List of variant specifications for styles.parse_variant()
+    :param dpis: List of raster resolutions, the first is written to out_file
+
+    :return: List of paths that were written (unchanged files are skipped)
+    """
+
+    from styles import parse_variant, recolour
+
+    written = []
+    for spec in variants:
+        name, groups = parse_variant(spec)
+        recolour(fig, groups)
+        written += save_figure(fig, variant_path(out_file, name), dpis)
+
+    if variants:
+        recolour(fig)
+
+    return written
@@ -0,0 +1,27 @@
+"""
+Helpers for using the numbered pipeline scripts from other scripts
+
+The script file names start with numbers and contain dashes so they can't be
+imported directly.
+"""
+
+import os
+
+
+def load_script(name):
+    """
+    Load one of the numbered pipeline scripts as a module
+
+    :param name: File name of the script in the scripts directory
+
+    :return: Module object
+    """
+
+    from importlib.util import module_from_spec, spec_from_file_location
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    spec = spec_from_file_location(name.replace("-", "_")[:-3], path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
@@ -0,0 +1,116 @@
+"""
+Country reference table shared by the combine and plotting scripts
+
+The reference table has one row per country code with the country name and the
+label used in figures. Highlight groups are not stored here, they come from
+styles.py so figure variants can change them. The table is built once by
+01-build-country-reference.py and stored as a compressed NumPy archive with a
+format version so scripts can load it quickly without parsing text.
+
+Labels are attached to a dataset by looking up each country category once and
+expanding the result with the category codes, so the cost depends on the
+number of countries rather than the number of rows.
+"""
+
+from functools import lru_cache
+
+# Increase this when the fields or their meaning change
+REFERENCE_VERSION = 2
+
+# Fields stored for each country, Code3 is the key
+REFERENCE_FIELDS = ["Code3", "Country", "CountryLabel"]
+
+
+def write_reference(reference, file):
+    """
+    Write a reference table to a compressed NumPy archive
+
+    :param reference: DataFrame with the REFERENCE_FIELDS columns
+    :param file: Path to the output file
+
+    :return: None
+    """
+
+    import numpy as np
+
+    if reference["Code3"].duplicated().any():
+        duplicated = reference.loc[reference["Code3"].duplicated(), "Code3"]
+        raise ValueError(f"Duplicated codes in reference table: {list(duplicated)}")
+
+    arrays = {
+        field: reference[field].to_numpy(dtype="str") for field in REFERENCE_FIELDS
+    }
+    with open(file, "wb") as out:
+        np.savez_compressed(out, version=np.array(REFERENCE_VERSION), **arrays)
+
+
+@lru_cache
+def load_reference(file):
+    """
+    Load a reference table, only reading the file once per process
+
+    :param file: Path to the reference file
+
+    :return: DataFrame indexed by Code3 with Country and CountryLabel columns,
+        this is shared between callers so should not be modified
+    """
+
+    import numpy as np
+    from pandas import DataFrame
+
+    with np.load(file, allow_pickle=False) as archive:
+        version = int(archive["version"])
+        if version != REFERENCE_VERSION:
+            raise ValueError(
+                f"Reference table '{file}' has version {version} but version "
+                f"{REFERENCE_VERSION} is required, rebuild it with "
+                "01-build-country-reference.py"
+            )
+        reference = DataFrame({field: archive[field] for field in REFERENCE_FIELDS})
+
+    reference = reference.set_index("Code3")
+
+    return reference
+
+
+def lookup_categories(codes, reference):
+    """
+    Find the reference row for each category of a set of country codes
+
+    :param codes: Series of country codes
+    :param reference: Reference DataFrame from load_reference()
+
+    :return: Tuple of the codes as a categorical Series and an array with the
+        reference row for each category, -1 for codes not in the reference
+    """
+
+    codes = codes.astype("category")
+    rows = reference.index.get_indexer(codes.cat.categories)
+
+    return codes, rows
+
+
+def lookup_field(codes, reference, field):
+    """
+    Look up a reference field for every row of a set of country codes
+
+    :param codes: Series of country codes
+    :param reference: Reference DataFrame from load_reference()
+    :param field: Name of the reference field
+
+    :return: Categorical with the field value for each row, missing for codes
+        that are not in the reference
+    """
+
+    import numpy as np
+    from pandas import Categorical
+
+    codes, rows = lookup_categories(codes, reference)
+
+    values = reference[field].to_numpy()
+    categories, category_codes = np.unique(values, return_inverse=True)
+    # Map each country category to a value category, -1 marks missing values
+    mapping = np.append(np.where(rows >= 0, category_codes[rows], -1), -1)
+    row_codes = mapping[codes.cat.codes.to_numpy()]
+
+    return Categorical.from_codes(row_codes, categories=categories)
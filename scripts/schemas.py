@@ -0,0 +1,331 @@
+"""
+Schemas for the raw, tidied and combined tables
+
+Each schema lists the columns in a file with a fixed dtype so pandas does not
+have to infer types on every read. Scripts read only the columns they need and
+the data is validated when it is read so problems are reported straight away
+instead of surfacing later as a pivot error or missing values.
+
+Schema entries:
+
+- sep: Field separator
+- dtype: Column names (in file order) and their dtypes
+- keys: Columns that should uniquely identify each row
+- required: Columns that must not have missing values
+- ranges: Minimum and maximum (None for no limit) allowed for each column
+"""
+
+# Maximum number of example rows shown for each validation problem
+MAX_EXAMPLES = 5
+
+RAW_HOUSE_PRICES = {
+    "name": "raw house prices",
+    "sep": ",",
+    "dtype": {
+        "COU": "category",
+        "Country": "str",
+        "IND": "category",
+        "Indicator": "str",
+        "TIME": "str",
+        "Time": "str",
+        "Unit Code": "str",
+        "Unit": "str",
+        "PowerCode Code": "str",
+        "PowerCode": "str",
+        "Reference Period Code": "str",
+        "Reference Period": "str",
+        "Value": "float64",
+        "Flag Codes": "str",
+        "Flags": "str",
+    },
+    "keys": ["COU", "TIME", "IND"],
+    "required": ["COU", "IND", "TIME"],
+    "ranges": {"Value": (0, None)},
+}
+
+RAW_PROPERTY_TAX = {
+    "name": "raw property tax",
+    "sep": ",",
+    "dtype": {
+        "LOCATION": "category",
+        "INDICATOR": "category",
+        "SUBJECT": "category",
+        "MEASURE": "category",
+        "FREQUENCY": "category",
+        "TIME": "int16",
+        "Value": "float32",
+        "Flag Codes": "str",
+    },
+    "keys": ["LOCATION", "TIME", "MEASURE"],
+    "required": ["LOCATION", "MEASURE", "TIME"],
+    "ranges": {"TIME": (1900, 2100), "Value": (0, 100)},
+}
+
+RAW_COUNTRY_CODES = {
+    "name": "raw country codes",
+    "sep": "\t",
+    "dtype": {
+        "Country name[5]": "str",
+        "Official state name[6]": "str",
+        "Sovereignty[6][7][8]": "str",
+        "Alpha-2 code[5]": "str",
+        "Alpha-3 code[5]": "str",
+        "Numeric code[5]": "str",
+        "Subdivision code links[3]": "str",
+        "Internet ccTLD[9]": "str",
+    },
+    "keys": [],
+    "required": ["Country name[5]", "Alpha-3 code[5]"],
+    "ranges": {},
+}
+
+COUNTRY_CODES = {
+    "name": "country codes",
+    "sep": "\t",
+    "dtype": {
+        "Country": "str",
+        "OfficialName": "str",
+        "Code2": "str",
+        "Code3": "str",
+        "CodeNumeric": "str",
+        "TLD": "str",
+    },
+    "keys": ["Code3"],
+    "required": ["Country", "Code3"],
+    "ranges": {},
+}
+
+HOUSE_PRICES = {
+    "name": "house prices",
+    "sep": "\t",
+    "dtype": {
+        "Code3": "category",
+        "Year": "int16",
+        "PriceIncomeRatio": "float64",
+        "RealPriceIndex": "float64",
+    },
+    "keys": ["Code3", "Year"],
+    "required": ["Code3", "Year"],
+    "ranges": {
+        "Year": (1900, 2100),
+        "PriceIncomeRatio": (0, None),
+        "RealPriceIndex": (0, None),
+    },
+}
+
+PROPERTY_TAX = {
+    "name": "property tax",
+    "sep": "\t",
+    "dtype": {
+        "Code3": "category",
+        "Year": "int16",
+        "PctGDP": "float32",
+        "PctTotalTax": "float32",
+    },
+    "keys": ["Code3", "Year"],
+    "required": ["Code3", "Year"],
+    "ranges": {"Year": (1900, 2100), "PctGDP": (0, 100), "PctTotalTax": (0, 100)},
+}
+
+COMBINED = {
+    "name": "combined",
+    "sep": "\t",
+    "dtype": {
+        "Code3": "category",
+        "Country": "category",
+        "CountryLabel": "category",
+        "Year": "int16",
+        "PriceIncomeRatio": "float32",
+        "RealPriceIndex": "float32",
+        "PctGDP": "float32",
+        "PctTotalTax": "float32",
+    },
+    "keys": ["Code3", "Year"],
+    "required": [
+        "Code3",
+        "Country",
+        "CountryLabel",
+        "Year",
+        "PriceIncomeRatio",
+        "RealPriceIndex",
+        "PctGDP",
+        "PctTotalTax",
+    ],
+    "ranges": {
+        "Year": (1900, 2100),
+        "PriceIncomeRatio": (0, None),
+        "RealPriceIndex": (0, None),
+        "PctGDP": (0, 100),
+        "PctTotalTax": (0, 100),
+    },
+}
+
+
+def read_table(file, schema, usecols=None):
+    """
+    Read a table using a schema and validate it
+
+    :param file: Path to the file to read
+    :param schema: Schema dictionary for the file
+    :param usecols: Columns to read, all columns in the schema if None
+
+    :return: Validated DataFrame
+    """
+
+    from pandas import read_csv
+
+    if usecols is None:
+        usecols = list(schema["dtype"])
+    unknown = [column for column in usecols if column not in schema["dtype"]]
+    if unknown:
+        raise ValueError(f"Columns not in the {schema['name']} schema: {unknown}")
+
+    table = read_csv(
+        file,
+        sep=schema["sep"],
+        usecols=usecols,
+        dtype={column: schema["dtype"][column] for column in usecols},
+    )
+    # Keep the column order from the schema
+    table = table[[column for column in schema["dtype"] if column in usecols]]
+    validate(table, schema)
+
+    return table
+
+
+def read_table_extremes(file, schema, by, on, usecols=None, chunk_size=100000):
+    """
+    Read only the first and last rows of each group of a table
+
+    The file is read in chunks and only the rows with the smallest and largest
+    value of the `on` column in each group are kept, so memory use depends on
+    the number of groups rather than the size of the file. Each chunk is
+    validated when it is read but duplicated keys are only found within a
+    chunk.
+
+    :param file: Path to the file to read
+    :param schema: Schema dictionary for the file
+    :param by: Column defining the groups
+    :param on: Column used to find the first and last rows, such as "Year"
+    :param usecols: Columns to read, all columns in the schema if None
+    :param chunk_size: Number of rows to read at a time
+
+    :return: Validated DataFrame sorted by the `by` and `on` columns
+    """
+
+    from pandas import concat, read_csv
+
+    if usecols is None:
+        usecols = list(schema["dtype"])
+    unknown = [column for column in usecols + [by, on] if column not in schema["dtype"]]
+    if unknown:
+        raise ValueError(f"Columns not in the {schema['name']} schema: {unknown}")
+    columns = [
+        column for column in schema["dtype"] if column in usecols or column in [by, on]
+    ]
+
+    # Categories are different in each chunk so read them as strings and
+    # convert once the rows are selected
+    dtype = {column: schema["dtype"][column] for column in columns}
+    categorical = [column for column in columns if dtype[column] == "category"]
+    dtype.update({column: "str" for column in categorical})
+
+    chunks = read_csv(
+        file,
+        sep=schema["sep"],
+        usecols=columns,
+        dtype=dtype,
+        chunksize=chunk_size,
+    )
+    table = None
+    for chunk in chunks:
+        chunk = chunk[columns]
+        validate(chunk, schema)
+        if table is not None:
+            chunk = concat([table, chunk], ignore_index=True)
+        values = chunk.groupby(by)[on]
+        extreme = (chunk[on] == values.transform("min")) | (
+            chunk[on] == values.transform("max")
+        )
+        table = chunk[extreme]
+
+    table = table.sort_values(by=[by, on]).reset_index(drop=True)
+    table = table.astype({column: "category" for column in categorical})
+    validate(table, schema)
+
+    return table
+
+
+def validate(table, schema):
+    """
+    Validate a DataFrame against a schema
+
+    Only the columns present in the DataFrame are checked. All checks are run
+    before raising so every problem is reported at once.
+
+    :param table: DataFrame to validate
+    :param schema: Schema dictionary for the table
+
+    :return: None, raises a ValueError if there are any problems
+    """
+
+    from math import inf
+
+    problems = []
+
+    keys = schema["keys"]
+    if keys and all(column in table.columns for column in keys):
+        duplicated = table.duplicated(subset=keys, keep=False)
+        if duplicated.any():
+            problems.append(
+                format_problem(
+                    f"{duplicated.sum()} rows with duplicated {tuple(keys)} keys",
+                    table.loc[duplicated, keys],
+                )
+            )
+
+    required = [column for column in schema["required"] if column in table.columns]
+    missing = table[required].isna()
+    for column in missing.columns[missing.any()]:
+        problems.append(
+            format_problem(
+                f"{missing[column].sum()} missing values in '{column}'",
+                table.loc[missing[column]],
+            )
+        )
+
+    for column, (minimum, maximum) in schema["ranges"].items():
+        if column not in table.columns:
+            continue
+        values = table[column]
+        lower = -inf if minimum is None else minimum
+        upper = inf if maximum is None else maximum
+        # Missing values are handled by the required check
+        invalid = values.notna() & ~values.between(lower, upper)
+        if invalid.any():
+            problems.append(
+                format_problem(
+                    f"{invalid.sum()} values in '{column}' outside [{minimum}, {maximum}]",
+                    table.loc[invalid],
+                )
+            )
+
+    if problems:
+        report = "\n".join(problems)
+        raise ValueError(f"Validation of {schema['name']} failed:\n{report}")
+
+
+def format_problem(message, examples):
+    """
+    Format a validation problem for the report
+
+    :param message: Description of the problem
+    :param examples: DataFrame with the rows that have the problem
+
+    :return: Formatted string
+    """
+
+    shown = examples.head(MAX_EXAMPLES).to_string(index=False)
+    shown = "\n".join(f"      {line}" for line in shown.split("\n"))
+
+    return f"  - {message}, for example:\n{shown}"
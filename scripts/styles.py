@@ -0,0 +1,200 @@
+"""
+Highlight groups, palette and label styles shared by the figures and report
+
+Countries are assigned to highlight groups and each group has a colour and a
+label style. Groups are resolved once for each country category rather than
+for each row, giving arrays that are indexed by the category codes.
+
+Artists drawn for a single country are given a gid made by country_gid(), and
+collections with an item for each country a gid made by countries_gid() and a
+country_codes attribute giving the country of each item, so a finished figure
+can be re-coloured for a different set of highlighted countries without
+drawing it again (see recolour()).
+"""
+
+# Countries in each highlight group, countries not in any group are in the
+# default group. If a country is in several groups the last one is used.
+HIGHLIGHT_GROUPS = {
+    "Highlight": ["NZL", "SWE", "CAN", "JPN"],
+    "Average": ["OECD"],
+}
+
+DEFAULT_GROUP = "Other"
+
+# Colour for each group
+PALETTE = {
+    "Highlight": "#E89611",
+    "Average": "#1C4EAA",
+    "Other": "#374043",
+}
+
+# Text properties for country labels in each group
+LABEL_STYLES = {
+    "Highlight": {"fontsize": 12},
+    "Average": {"fontsize": 12},
+    "Other": {"fontsize": 12},
+}
+
+# Saturation of bar colours, seaborn desaturates bar plot palettes
+BAR_SATURATION = 0.75
+
+
+def resolve_groups(categories, groups=None):
+    """
+    Resolve the highlight group for each country
+
+    :param categories: Array of country codes, usually the categories of a
+        categorical Series
+    :param groups: Dictionary of group names to lists of country codes,
+        HIGHLIGHT_GROUPS if None
+
+    :return: Array with the group of each country
+    """
+
+    import numpy as np
+
+    if groups is None:
+        groups = HIGHLIGHT_GROUPS
+
+    categories = np.asarray(categories, dtype=str)
+    resolved = np.full(len(categories), DEFAULT_GROUP, dtype=object)
+    for group, codes in groups.items():
+        resolved[np.isin(categories, codes)] = group
+
+    return resolved
+
+
+def resolve_colours(categories, groups=None, palette=None):
+    """
+    Resolve the colour for each country
+
+    :param categories: Array of country codes, usually the categories of a
+        categorical Series
+    :param groups: Dictionary of group names to lists of country codes,
+        HIGHLIGHT_GROUPS if None
+    :param palette: Dictionary of group names to colours, PALETTE if None
+
+    :return: Array with the colour of each country
+    """
+
+    from pandas import Series
+
+    if palette is None:
+        palette = PALETTE
+
+    resolved = resolve_groups(categories, groups)
+    colours = Series(resolved).map(palette).to_numpy()
+
+    return colours
+
+
+def parse_variant(spec):
+    """
+    Parse a figure variant specification
+
+    :param spec: String such as "nordic:SWE,NOR,DNK,FIN" giving the variant
+        name and the countries to highlight
+
+    :return: Tuple of the variant name and a groups dictionary
+    """
+
+    name, _, codes = spec.partition(":")
+    codes = [code.strip() for code in codes.split(",") if code.strip()]
+    if not name or not codes:
+        raise ValueError(f"Variant '{spec}' should be given as NAME:CODE,CODE,...")
+
+    groups = {**HIGHLIGHT_GROUPS, "Highlight": codes}
+
+    return name, groups
+
+
+def country_gid(role, code, ax):
+    """
+    Get the gid for an artist drawn for a single country
+
+    :param role: What the artist is, either "bar" or "label"
+    :param code: Country code
+    :param ax: matplotlib axes object the artist is drawn on
+
+    :return: gid string, unique within the figure
+    """
+
+    panel = ax.get_figure().axes.index(ax)
+
+    return f"{role}-{code}-{panel}"
+
+
+def countries_gid(role, ax):
+    """
+    Get the gid for a collection with an item for each country
+
+    The collection should also have a country_codes attribute listing the
+    country of each item, in order.
+
+    :param role: What the collection is, currently only "points"
+    :param ax: matplotlib axes object the collection is drawn on
+
+    :return: gid string, unique within the figure
+    """
+
+    panel = ax.get_figure().axes.index(ax)
+
+    return f"{role}-{panel}"
+
+
+def recolour(fig, groups=None, palette=None, label_styles=None):
+    """
+    Re-colour the country artists in a figure
+
+    Only artist colours and label styles are changed so this is much cheaper
+    than building the figure again. Labels are not moved, so label styles that
+    change the size of the text may need the figure to be built again, and
+    properties missing from a group's label style are left as they are.
+
+    :param fig: matplotlib figure object
+    :param groups: Dictionary of group names to lists of country codes,
+        HIGHLIGHT_GROUPS if None
+    :param palette: Dictionary of group names to colours, PALETTE if None
+    :param label_styles: Dictionary of group names to text properties,
+        LABEL_STYLES if None
+
+    :return: Number of artists that were re-coloured
+    """
+
+    import numpy as np
+    from seaborn.utils import desaturate
+
+    if label_styles is None:
+        label_styles = LABEL_STYLES
+
+    artists = fig.findobj(
+        lambda artist: (artist.get_gid() or "").split("-")[0]
+        in ("bar", "label", "points")
+    )
+    if not artists:
+        return 0
+
+    # Codes can contain "-" so only the role and panel are split off
+    roles = [artist.get_gid().split("-", 1)[0] for artist in artists]
+    artist_codes = [
+        artist.country_codes
+        if role == "points"
+        else [artist.get_gid().split("-", 1)[1].rsplit("-", 1)[0]]
+        for artist, role in zip(artists, roles)
+    ]
+    codes = np.unique(np.concatenate(artist_codes).astype(str))
+    code_groups = resolve_groups(codes, groups)
+    colours = resolve_colours(codes, groups, palette)
+
+    for artist, role, items in zip(artists, roles, artist_codes):
+        idx = np.searchsorted(codes, items)
+        if role == "bar":
+            artist.set_facecolor(desaturate(colours[idx[0]], BAR_SATURATION))
+        elif role == "label":
+            artist.update(label_styles[code_groups[idx[0]]])
+            artist.set_color(colours[idx[0]])
+        else:
+            # Edges were drawn in the point colours too so set both
+            artist.set_color(colours[idx])
+
+    return len(artists)
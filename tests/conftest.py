@@ -0,0 +1,15 @@
+"""
+Shared setup for the tests
+
+The scripts are not a package so their directory is added to the import path,
+numbered scripts are loaded with pipeline.load_script().
+"""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, "scripts")
+DATA_DIR = os.path.join(REPO_DIR, "data")
+
+sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,105 @@
+"""
+Check the DuckDB backend gives the same combined dataset as the pandas scripts
+"""
+
+import os
+
+import pytest
+
+from conftest import DATA_DIR
+
+
+def combine_with_pandas(reference_file, house_prices_file, property_tax_file):
+    """
+    Tidy and combine the raw datasets with the pandas scripts
+
+    :param reference_file: Path to country reference table
+    :param house_prices_file: Path to CSV file containing raw house prices data
+    :param property_tax_file: Path to CSV file containing raw property tax data
+
+    :return: Combined DataFrame
+    """
+
+    from pipeline import load_script
+    from reference import load_reference
+    from schemas import RAW_HOUSE_PRICES, RAW_PROPERTY_TAX, read_table
+
+    house_prices = load_script("01-tidy-house-prices.py")
+    property_tax = load_script("01-tidy-property-tax.py")
+    combine = load_script("02-combine-datasets.py")
+
+    return combine.combine_datasets(
+        load_reference(reference_file),
+        house_prices.tidy_house_prices(
+            read_table(
+                house_prices_file, RAW_HOUSE_PRICES, usecols=house_prices.COLUMNS
+            )
+        ),
+        property_tax.tidy_property_tax(
+            read_table(
+                property_tax_file, RAW_PROPERTY_TAX, usecols=property_tax.COLUMNS
+            )
+        ),
+    )
+
+
+def test_duckdb_matches_pandas(tmp_path):
+    """The DuckDB query and the pandas scripts give identical output"""
+
+    duckdb = pytest.importorskip("duckdb")
+
+    from pipeline import load_script
+    from reference import load_reference
+
+    combine_duckdb = load_script("02-combine-duckdb.py")
+
+    reference_file = os.path.join(DATA_DIR, "01-tidied", "country-reference.npz")
+    house_prices_file = os.path.join(DATA_DIR, "00-raw", "house-prices.csv")
+    property_tax_file = os.path.join(DATA_DIR, "00-raw", "property-tax.csv")
+
+    pandas_file = tmp_path / "pandas.tsv"
+    combine_with_pandas(reference_file, house_prices_file, property_tax_file).to_csv(
+        pandas_file, sep="\t", index=False
+    )
+
+    duckdb_file = tmp_path / "duckdb.tsv"
+    combine_duckdb.combine_raw_datasets(
+        duckdb.connect(),
+        load_reference(reference_file),
+        house_prices_file,
+        property_tax_file,
+        str(duckdb_file),
+    )
+
+    combine_duckdb.compare_outputs(duckdb_file, pandas_file)
+    assert duckdb_file.read_bytes() == pandas_file.read_bytes()
+
+
+def test_duckdb_rejects_duplicated_keys(tmp_path):
+    """A duplicated raw row fails validation instead of being combined"""
+
+    duckdb = pytest.importorskip("duckdb")
+
+    from pipeline import load_script
+    from reference import load_reference
+
+    combine_duckdb = load_script("02-combine-duckdb.py")
+
+    house_prices_file = tmp_path / "house-prices.csv"
+    raw = open(os.path.join(DATA_DIR, "00-raw", "house-prices.csv")).read()
+    house_prices_file.write_text(
+        raw.rstrip("\n")
+        + '\nAUS,Australia,RHP,"Real house price indices, s.a.",2010,2010,'
+        + "IDX,Index,0,Units,,,999.0,,\n"
+    )
+
+    with pytest.raises(ValueError, match="duplicated"):
+        combine_duckdb.combine_raw_datasets(
+            duckdb.connect(),
+            load_reference(
+                os.path.join(DATA_DIR, "01-tidied", "country-reference.npz")
+            ),
+            str(house_prices_file),
+            os.path.join(DATA_DIR, "00-raw", "property-tax.csv"),
+            str(tmp_path / "combined.tsv"),
+        )
@@ -0,0 +1,233 @@
+"""
+Test downloading the raw datasets against a local stub server
+"""
+
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+
+# Kept before no_retry_delay() replaces it so the stub server can still wait
+SLEEP = asyncio.sleep
+
+
+@pytest.fixture
+def download():
+    """The download script loaded as a module"""
+
+    from pipeline import load_script
+
+    return load_script("00-download-datasets.py")
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    """Retry straight away instead of waiting between attempts"""
+
+    async def no_delay(delay, *args, **kwargs):
+        return await SLEEP(0, *args, **kwargs)
+
+    monkeypatch.setattr(asyncio, "sleep", no_delay)
+
+
+class StubServer:
+    """
+    Serve files from memory with strong ETags and Range and If-Range support
+
+    :param files: Dictionary of file name to content bytes
+    """
+
+    def __init__(self, files):
+        self.files = dict(files)
+        self.failures = {}
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.url = None
+
+    def etag(self, name):
+        return f'"{hashlib.sha256(self.files[name]).hexdigest()[:16]}"'
+
+    async def handle(self, request):
+        name = request.match_info["name"]
+        self.requests.append((name, request.headers.get("Range")))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            # Give the other downloads a chance to start
+            await SLEEP(0.05)
+            if self.failures.get(name, 0) > 0:
+                self.failures[name] -= 1
+                return web.Response(status=503)
+
+            body = self.files[name]
+            etag = self.etag(name)
+            headers = {"ETag": etag}
+            range_header = request.headers.get("Range")
+            if_range = request.headers.get("If-Range")
+            if range_header is None or (if_range is not None and if_range != etag):
+                return web.Response(body=body, headers=headers)
+
+            start = int(range_header.removeprefix("bytes=").removesuffix("-"))
+            if start >= len(body):
+                headers["Content-Range"] = f"bytes */{len(body)}"
+                return web.Response(status=416, headers=headers)
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            return web.Response(status=206, body=body[start:], headers=headers)
+        finally:
+            self.active -= 1
+
+    def source(self, name, checksum=""):
+        return {
+            "Name": name,
+            "URL": f"{self.url}/{name}",
+            "File": name,
+            "SHA256": checksum,
+        }
+
+
+@asynccontextmanager
+async def serve(files):
+    """Run a StubServer on a free local port"""
+
+    server = StubServer(files)
+    app = web.Application()
+    app.router.add_get("/{name}", server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    server.url = f"http://{host}:{port}"
+    try:
+        yield server
+    finally:
+        await runner.cleanup()
+
+
+def test_downloads_sources_concurrently(download, tmp_path):
+    """All sources are fetched at the same time and written to the output"""
+
+    files = {"a.csv": b"a" * 100000, "b.csv": b"b" * 50000}
+
+    async def run():
+        async with serve(files) as server:
+            sources = [server.source(name) for name in files]
+            paths = await download.download_datasets(sources, tmp_path)
+        return server, paths
+
+    server, paths = asyncio.run(run())
+
+    assert server.max_active == 2
+    assert paths == [str(tmp_path / name) for name in files]
+    for name, body in files.items():
+        assert (tmp_path / name).read_bytes() == body
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(files)
+
+
+def test_resumes_partial_download(download, tmp_path):
+    """A partial file with a matching validator is continued from its end"""
+
+    body = bytes(range(256)) * 400
+
+    async def run():
+        async with serve({"a.csv": body}) as server:
+            (tmp_path / "a.csv.part").write_bytes(body[:30000])
+            (tmp_path / "a.csv.part.validator").write_text(server.etag("a.csv"))
+            await download.download_datasets([server.source("a.csv")], tmp_path)
+        return server
+
+    server = asyncio.run(run())
+
+    assert server.requests == [("a.csv", "bytes=30000-")]
+    assert (tmp_path / "a.csv").read_bytes() == body
+    assert not (tmp_path / "a.csv.part").exists()
+    assert not (tmp_path / "a.csv.part.validator").exists()
+
+
+def test_changed_file_restarts_download(download, tmp_path):
+    """A partial file from an older version is replaced, not extended"""
+
+    async def run():
+        async with serve({"a.csv": b"A" * 50000}) as server:
+            old_etag = server.etag("a.csv")
+            server.files["a.csv"] = b"B" * 80000
+            (tmp_path / "a.csv.part").write_bytes(b"A" * 30000)
+            (tmp_path / "a.csv.part.validator").write_text(old_etag)
+            await download.download_datasets([server.source("a.csv")], tmp_path)
+
+    asyncio.run(run())
+
+    assert (tmp_path / "a.csv").read_bytes() == b"B" * 80000
+
+
+def test_retries_unavailable_server(download, tmp_path):
+    """A 503 response is retried until the download succeeds"""
+
+    async def run():
+        async with serve({"a.csv": b"a" * 1000}) as server:
+            server.failures["a.csv"] = 2
+            await download.download_datasets(
+                [server.source("a.csv")], tmp_path, retries=2
+            )
+        return server
+
+    server = asyncio.run(run())
+
+    assert len(server.requests) == 3
+    assert (tmp_path / "a.csv").read_bytes() == b"a" * 1000
+
+
+def test_gives_up_after_retries(download, tmp_path):
+    """The error is raised when every attempt fails"""
+
+    async def run():
+        async with serve({"a.csv": b"a" * 1000}) as server:
+            server.failures["a.csv"] = 3
+            await download.download_datasets(
+                [server.source("a.csv")], tmp_path, retries=2
+            )
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(run())
+
+    assert not (tmp_path / "a.csv").exists()
+
+
+def test_checksum_mismatch(download, tmp_path):
+    """A download that does not match its checksum is removed and reported"""
+
+    wrong = hashlib.sha256(b"something else").hexdigest()
+
+    async def run():
+        async with serve({"a.csv": b"a" * 1000}) as server:
+            await download.download_datasets([server.source("a.csv", wrong)], tmp_path)
+
+    with pytest.raises(ValueError, match="does not match"):
+        asyncio.run(run())
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_checksum_skips_current_file(download, tmp_path):
+    """A file that already matches its checksum is not downloaded again"""
+
+    body = b"a" * 1000
+
+    async def run():
+        async with serve({"a.csv": body}) as server:
+            (tmp_path / "a.csv").write_bytes(body)
+            checksum = hashlib.sha256(body).hexdigest()
+            await download.download_datasets(
+                [server.source("a.csv", checksum)], tmp_path
+            )
+        return server
+
+    server = asyncio.run(run())
+
+    assert server.requests == []
@@ -0,0 +1,74 @@
+"""
+Test re-colouring finished figures for other highlight groups
+"""
+
+import pytest
+
+pytest.importorskip("matplotlib")
+pytest.importorskip("seaborn")
+
+
+def build_figure(codes):
+    """Draw a bar, a label and a point collection for each country"""
+
+    from matplotlib.colors import to_rgba
+
+    from figures import new_figure
+    from styles import PALETTE, countries_gid, country_gid
+
+    fig, ax = new_figure()
+    for pos, code in enumerate(codes):
+        bar = ax.bar(pos, 1, color=PALETTE["Other"])[0]
+        bar.set_gid(country_gid("bar", code, ax))
+        ax.text(
+            pos, 1, code, color=PALETTE["Other"], gid=country_gid("label", code, ax)
+        )
+    points = ax.scatter(
+        range(len(codes)),
+        range(len(codes)),
+        color=[to_rgba(PALETTE["Other"])] * len(codes),
+        gid=countries_gid("points", ax),
+    )
+    points.country_codes = list(codes)
+
+    return fig, ax, points
+
+
+def test_recolour_collection_and_hyphenated_codes():
+    """Each point in a collection gets the colour of its own country"""
+
+    from matplotlib.colors import to_hex
+
+    from styles import PALETTE, recolour
+
+    codes = ["AUS", "EU-27", "NZL"]
+    fig, ax, points = build_figure(codes)
+
+    groups = {"Highlight": ["EU-27"], "Average": ["NZL"]}
+    assert recolour(fig, groups) == 2 * len(codes) + 1
+
+    expected = [PALETTE["Other"], PALETTE["Highlight"], PALETTE["Average"]]
+    assert [to_hex(colour) for colour in points.get_facecolors()] == [
+        colour.lower() for colour in expected
+    ]
+    assert [to_hex(colour) for colour in points.get_edgecolors()] == [
+        colour.lower() for colour in expected
+    ]
+    labels = {text.get_text(): to_hex(text.get_color()) for text in ax.texts}
+    assert labels["EU-27"] == PALETTE["Highlight"].lower()
+
+
+def test_recolour_round_trip():
+    """Re-colouring back to the default groups restores the colours"""
+
+    from styles import HIGHLIGHT_GROUPS, recolour
+
+    fig, ax, points = build_figure(["CAN", "DEU", "OECD"])
+    recolour(fig)
+    original = points.get_facecolors().copy()
+
+    recolour(fig, {"Highlight": ["DEU"]})
+    assert not (points.get_facecolors() == original).all()
+
+    recolour(fig, HIGHLIGHT_GROUPS)
+    assert (points.get_facecolors() == original).all()